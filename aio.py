@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+#----------------------------------------------------------------------------#
+# Async read path.
+#----------------------------------------------------------------------------#
+
+# the detail pages need several independent reads: the row, its genres,
+# its upcoming shows and its past shows. with ASYNC_READS they are issued
+# at once, each on its own connection from an async engine (asyncpg on
+# postgres, aiosqlite for the benchmarks), so a page waits for its slowest
+# query instead of the sum of them. the engine and its pool belong to one
+# event loop per process, run in a background thread; request threads hand
+# it coroutines and wait for the results. the listings read their page
+# of rows the same way (see pagination.load_page). writes stay on
+# db.session.
+
+# async drivers for the databases SQLALCHEMY_DATABASE_URI may point at
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite',
+}
+
+
+def async_url(url):
+    # url with its driver swapped for the async one
+    url = make_url(url)
+    return url.set(drivername='{}+{}'.format(
+        url.get_backend_name(), ASYNC_DRIVERS[url.get_backend_name()]))
+
+
+class AsyncReads(object):
+    def __init__(self):
+        self.enabled = False
+        self.url = None
+        self.options = {}
+        self._engine = None
+        self._loop = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('ASYNC_READS', False)
+        self.url = async_url(config['SQLALCHEMY_DATABASE_URI'])
+        self.options = {}
+        if self.url.get_backend_name() == 'postgresql':
+            # the same pool settings as the sync engine, sized separately
+            self.options.update({
+                'pool_size': config.get('ASYNC_POOL_SIZE', 10),
+                'max_overflow': config.get('ASYNC_MAX_OVERFLOW', 20),
+                'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+                'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+                'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+            })
+            if config.get('DB_STATEMENT_TIMEOUT'):
+                self.options['connect_args'] = {'server_settings': {
+                    'statement_timeout': str(config['DB_STATEMENT_TIMEOUT'])}}
+        app.extensions['async_reads'] = self
+
+    def _start(self):
+        # the loop and the engine are created on first use in each process,
+        # so a forked worker never shares its parent's connections
+        with self._lock:
+            if self._pid != os.getpid():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='fyyur-async-reads',
+                                 daemon=True).start()
+                self._loop = loop
+                self._engine = create_async_engine(self.url, **self.options)
+                self._pid = os.getpid()
+            return self._loop
+
+    @property
+    def engine(self):
+        self._start()
+        return self._engine
+
+    def run(self, coroutine):
+        # run coroutine on this process's loop and wait for its result
+        return asyncio.run_coroutine_threadsafe(coroutine, self._start()).result()
+
+    async def fetch(self, statement):
+        # every row of statement, on a connection of its own
+        async with self.engine.connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+    async def gather(self, *statements):
+        # the rows of each statement, run concurrently
+        return await asyncio.gather(*[self.fetch(statement) for statement in statements])
+
+    def stats(self):
+        if self._engine is None or self._pid != os.getpid():
+            return {'enabled': self.enabled, 'started': False}
+        pool = self._engine.pool
+        return {'enabled': self.enabled, 'started': True,
+                'size': pool.size(), 'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(), 'overflow': pool.overflow()}
+
+    def dispose(self):
+        if self._engine is not None and self._pid == os.getpid():
+            self.run(self._engine.dispose())
@@ -0,0 +1,229 @@
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, abort, jsonify, request
+
+from availability import parse_range, free_query, calendar
+from models import Venue, Artist, Show
+from pagination import paginate, load_page
+from queries import venue_listing_query, filter_listing, with_relationships, \
+    load_venue_detail, load_artist_detail, venue_version, artist_version, listing_version
+
+#----------------------------------------------------------------------------#
+# JSON API.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is None or request.if_modified_since is None:
+        return False
+
+    # http dates have second precision
+    last_modified = last_modified.replace(microsecond=0)
+    since = request.if_modified_since
+    if since.tzinfo is not None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+def conditional(version, build):
+    # answer a GET from version alone when the client's copy is current,
+    # otherwise call build() for the response data. version is the
+    # (fingerprint, last modified) pair from one of the *_version queries.
+    fingerprint, last_modified = version
+    etag = hashlib.sha1(
+        repr((request.full_path, fingerprint)).encode('utf-8')).hexdigest()
+
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def _page(page, items):
+    return {
+        'data': items,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+
+
+@api.route('/venues')
+def venues():
+    def build():
+        page = load_page(filter_listing(venue_listing_query(), Venue, request.args),
+                         (Venue.name, Venue.id))
+        return _page(page, [{
+            'id': row.id,
+            'name': row.name,
+            'city': row.city,
+            'state': row.state,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in page.items])
+
+    # show counters live on the venue rows, so their updated_at covers them
+    return conditional(listing_version(Venue), build)
+
+
+def _detail_json(detail):
+    # show times go out in the format they always have. detail is None
+    # when the row was deleted after its version was read.
+    if detail is None:
+        abort(404)
+    for key in ('past_shows', 'upcoming_shows'):
+        detail[key] = [dict(show, start_time=show['start_time'].strftime('%Y-%m-%d %H:%M:%S'))
+                       for show in detail[key]]
+    return detail
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    now = datetime.utcnow()
+    version = venue_version(venue_id, now)
+    if version is None:
+        abort(404)
+    return conditional(version, lambda: _detail_json(load_venue_detail(venue_id, now=now)))
+
+
+@api.route('/artists')
+def artists():
+    def build():
+        page = load_page(filter_listing(Artist.query, Artist, request.args),
+                         (Artist.name, Artist.id))
+        return _page(page, [{
+            'id': artist.id,
+            'name': artist.name
+        } for artist in page.items])
+
+    return conditional(listing_version(Artist), build)
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    now = datetime.utcnow()
+    version = artist_version(artist_id, now)
+    if version is None:
+        abort(404)
+    return conditional(version, lambda: _detail_json(load_artist_detail(artist_id, now=now)))
+
+
+@api.route('/shows')
+def shows():
+    def build():
+        page = paginate(with_relationships(
+            Show.query, Show.artist, Show.venue), (Show.starts_at, Show.id))
+        return _page(page, [show.show_listing() for show in page.items])
+
+    return conditional(listing_version(Show, Venue, Artist), build)
+
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def _range():
+    try:
+        return parse_range(request.args)
+    except ValueError:
+        abort(400)
+
+
+def _calendar_json(entries, start, end):
+    for entry in entries:
+        for window in entry['busy'] + entry['free']:
+            window['start_time'] = window['start_time'].isoformat()
+            window['end_time'] = window['end_time'].isoformat()
+    return {'start': start.isoformat(), 'end': end.isoformat(), 'data': entries}
+
+
+@api.route('/venues/available')
+def available_venues():
+    # venues, optionally of a city, state or genre, with no show in the range
+    start, end = _range()
+
+    def build():
+        query = filter_listing(venue_listing_query(), Venue, request.args)
+        page = paginate(free_query(query, Venue, start, end), (Venue.name, Venue.id))
+        return _page(page, [{
+            'id': row.id,
+            'name': row.name,
+            'city': row.city,
+            'state': row.state,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in page.items])
+
+    return conditional(listing_version(Show, Venue), build)
+
+
+@api.route('/artists/available')
+def available_artists():
+    start, end = _range()
+
+    def build():
+        query = filter_listing(Artist.query, Artist, request.args)
+        page = paginate(free_query(query, Artist, start, end), (Artist.name, Artist.id))
+        return _page(page, [{
+            'id': artist.id,
+            'name': artist.name
+        } for artist in page.items])
+
+    return conditional(listing_version(Show, Artist), build)
+
+
+@api.route('/venues/calendar')
+def venues_calendar():
+    # busy and free windows of every matching venue, in one query
+    start, end = _range()
+    query = filter_listing(Venue.query, Venue, request.args)
+    return conditional(listing_version(Show, Venue, Artist), lambda: _calendar_json(
+        calendar(query, Venue, start, end), start, end))
+
+
+@api.route('/artists/calendar')
+def artists_calendar():
+    start, end = _range()
+    query = filter_listing(Artist.query, Artist, request.args)
+    return conditional(listing_version(Show, Venue, Artist), lambda: _calendar_json(
+        calendar(query, Artist, start, end), start, end))
+
+
+@api.route('/venues/<int:venue_id>/calendar')
+def venue_calendar(venue_id):
+    start, end = _range()
+    version = venue_version(venue_id)
+    if version is None:
+        abort(404)
+
+    def build():
+        entries = calendar(Venue.query.filter(Venue.id == venue_id), Venue, start, end)
+        if not entries:
+            abort(404)
+        calendar_json = _calendar_json(entries, start, end)
+        return dict(calendar_json['data'][0], start=calendar_json['start'],
+                    end=calendar_json['end'])
+
+    return conditional(version, build)
+
+
+@api.route('/artists/<int:artist_id>/calendar')
+def artist_calendar(artist_id):
+    start, end = _range()
+    version = artist_version(artist_id)
+    if version is None:
+        abort(404)
+
+    def build():
+        entries = calendar(Artist.query.filter(Artist.id == artist_id), Artist, start, end)
+        if not entries:
+            abort(404)
+        calendar_json = _calendar_json(entries, start, end)
+        return dict(calendar_json['data'][0], start=calendar_json['start'],
+                    end=calendar_json['end'])
+
+    return conditional(version, build)
@@ -0,0 +1,157 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+
+from availability import calendar_feed
+from extensions import db, queue
+from models import Artist
+from pagination import load_page
+from queries import filter_listing, with_relationships, cached_artist_detail, \
+    invalidate_artist, invalidate_artist_venues
+from search import search
+
+#----------------------------------------------------------------------------#
+# Artist pages.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('artists', __name__)
+
+
+@blueprint.route('/artists')
+def artists():
+    # query one page of artists ordered by name
+    page = load_page(filter_listing(Artist.query, Artist, request.args),
+                     (Artist.name, Artist.id))
+
+    return render_template('pages/artists.html', artists=page.items, page=page)
+
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+    # search artists by name, city and genres, ranked by relevance
+    search_term = request.form.get('search_term', '')
+    # genre, city and state may narrow it, from the form or the query string
+    response = search(Artist, search_term, filters=request.values)
+
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+
+@blueprint.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id, loading all of its
+    # shows and their venues in a single query on a cache miss
+    data = cached_artist_detail(artist_id)
+
+    if data is None:
+        abort(404)
+
+    return render_template('pages/show_artist.html', artist=data)
+
+
+
+@blueprint.route('/artists/<int:artist_id>/calendar.ics')
+def artist_calendar(artist_id):
+    return calendar_feed(Artist, artist_id)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    from forms import ArtistForm
+    form = ArtistForm()
+
+    artist_to_edit = with_relationships(
+        Artist.query, Artist.genre_objects).get_or_404(artist_id)
+    if request.method == 'GET':
+        form.name.data = artist_to_edit.name
+        form.city.data = artist_to_edit.city
+        form.state.data = artist_to_edit.state
+        form.phone.data = artist_to_edit.phone
+        form.genres.data = artist_to_edit.genres
+        form.facebook_link.data = artist_to_edit.facebook_link
+        form.image_link.data = artist_to_edit.image_link
+        form.seeking_venue.data = artist_to_edit.seeking_venue
+        form.seeking_description.data = artist_to_edit.seeking_description
+
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist_to_edit)
+
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+
+    artist_to_edit = with_relationships(
+        Artist.query, Artist.genre_objects).get_or_404(artist_id)
+    from forms import ArtistForm
+    form = ArtistForm(Artist=artist_to_edit)
+
+    if request.method == 'POST':
+        artist_to_edit.name = form.name.data
+        artist_to_edit.city = form.city.data
+        artist_to_edit.state = form.state.data
+        artist_to_edit.phone = form.phone.data
+        artist_to_edit.genres = form.genres.data
+        artist_to_edit.facebook_link = form.facebook_link.data
+        artist_to_edit.image_link = form.image_link.data
+        artist_to_edit.seeking_venue = form.seeking_venue.data
+        artist_to_edit.seeking_description = form.seeking_description.data
+
+        try:
+            # the flush sets updated_at, which keys the fan-out: a
+            # resubmitted, unchanged form does not enqueue it twice
+            db.session.flush()
+            updated_at = artist_to_edit.updated_at
+            db.session.commit()
+            invalidate_artist(artist_id)
+            queue.enqueue(invalidate_artist_venues, artist_id,
+                          idempotency_key='artist-updated:{}:{}'.format(
+                              artist_id, updated_at.isoformat()))
+            flash('Artist ' + request.form['name'] +
+                  ' was successfully updated!')
+            return redirect(url_for('artists.show_artist', artist_id=artist_id))
+        except:
+            db.session.rollback()
+            flash('An error occurred. Artist could not be edited.')
+            return redirect(url_for('artists.edit_artist', artist_id=artist_id, form=form))
+    else:
+        return render_template('forms/edit_artist.html', form=form, artist=artist_to_edit)
+
+
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    from forms import ArtistForm
+    form = ArtistForm()
+    if form.validate_on_submit():
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        phone = form.phone.data
+        image_link = form.image_link.data
+        website_link = form.website_link.data
+        facebook_link = form.facebook_link.data
+        seeking_venue = form.seeking_venue.data
+        seeking_description = form.seeking_description.data
+        genres = form.genres.data
+
+        artist = Artist(name=name, city=city, phone=phone, state=state, facebook_link=facebook_link, image_link=image_link,
+                        website=website_link, seeking_venue=seeking_venue, genres=genres, seeking_description=seeking_description)
+        db.session.add(artist)
+        db.session.commit()
+    # on successful db insert, flash success
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    else:
+        flash('An error occurred. Artist ' +
+              request.form['name'] + ' could not be listed.')
+    # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+    return render_template('pages/home.html')
@@ -0,0 +1,292 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#----------------------------------------------------------------------------#
+
+# the stylesheets and scripts every page loads are concatenated into a few
+# bundles, the css minified, and written to static/dist under a name
+# carrying a hash of their content, next to gzip and brotli variants
+# compressed once at the highest levels. /assets/<name> serves the variant
+# the client accepts and lets it cache the file for a year: a changed
+# source is a new name, so nothing is ever revalidated. bundles are built
+# by `flask assets-build` or on first use when missing, and rebuilt in
+# debug mode when a source changes. pages link them with
+#
+#     {% for href in asset_urls('fyyur.css') %}...{% endfor %}
+#
+# which yields the source files instead when ASSETS_AUTO_BUILD is off and
+# nothing was built.
+#
+# html responses are compressed on the fly once they pass
+# COMPRESS_MIN_SIZE; smaller ones are not worth the cpu or the header.
+
+# bundle name -> sources under static/, in load order
+BUNDLES = {
+    'fyyur.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # loaded synchronously in <head>, before the page renders
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    'fyyur.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+MANIFEST = 'manifest.json'
+
+# content codings, best first, and the suffix of their precompressed files
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# on-the-fly levels: cheap enough to pay per response
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_comment = re.compile(r'/\*.*?\*/', re.S)
+_space = re.compile(r'\s+')
+_punctuation = re.compile(r'\s*([{};,>])\s*')
+_url = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _brotli():
+    # the brotli module, or None; without it only gzip is offered
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def minify_css(text):
+    # drop comments and the whitespace around punctuation. conservative:
+    # ':' is left alone so 'a :hover' keeps its meaning, and so are '+',
+    # '~' and calc(), whose spaces can matter.
+    text = _comment.sub('', text)
+    text = _space.sub(' ', text)
+    text = _punctuation.sub(r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def rebase_urls(text, source, static_url_path):
+    # make url() references relative to source absolute, since the bundle
+    # is served from another directory
+    base = posixpath.dirname(source)
+
+    def rebase(match):
+        quote, target = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', target):
+            return match.group(0)
+        path, rest = re.match(r'([^?#]*)(.*)', target).groups()
+        path = posixpath.normpath(posixpath.join(base, path))
+        return 'url({0}{1}/{2}{3}{0})'.format(quote, static_url_path, path, rest)
+
+    return _url.sub(rebase, text)
+
+
+def _write(path, data):
+    # workers building at once write identical files; never expose a
+    # half-written one
+    partial = '{}.{}.tmp'.format(path, os.getpid())
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, path)
+
+
+def build(static_folder, output, static_url_path='/static', bundles=None):
+    # write every bundle and its compressed variants to output and return
+    # the manifest, bundle name -> fingerprinted file name
+    brotli = _brotli()
+    os.makedirs(output, exist_ok=True)
+    manifest = {}
+    for name, sources in (bundles or BUNDLES).items():
+        stem, extension = os.path.splitext(name)
+        parts = []
+        for source in sources:
+            with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+                text = f.read()
+            if extension == '.css':
+                text = minify_css(rebase_urls(text, source, static_url_path))
+            parts.append(text)
+        # scripts are only concatenated; a missing semicolon at the end of
+        # one must not run into the next
+        data = (';\n' if extension == '.js' else '\n').join(parts).encode('utf-8')
+
+        filename = '{}.{}{}'.format(stem, hashlib.sha256(data).hexdigest()[:12], extension)
+        path = os.path.join(output, filename)
+        _write(path, data)
+        _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(path + '.br', brotli.compress(data, quality=11))
+        manifest[name] = filename
+
+    _write(os.path.join(output, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    # earlier builds' files are dropped; pages still cached by a browser
+    # would link them, but those are served from its cache
+    keep = {MANIFEST} | {filename + suffix for filename in manifest.values()
+                         for suffix in [''] + [suffix for encoding, suffix in ENCODINGS]}
+    for filename in os.listdir(output):
+        if filename not in keep and not filename.endswith('.tmp'):
+            os.remove(os.path.join(output, filename))
+    return manifest
+
+
+def accepted_encoding(available):
+    # the best content coding in available the client accepts, or None
+    for encoding, suffix in ENCODINGS:
+        if encoding in available and request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return _brotli().compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+blueprint = Blueprint('assets', __name__)
+
+
+@blueprint.route('/assets/<name>')
+def asset(name):
+    assets = current_app.extensions['assets']
+    if name not in assets.files():
+        abort(404)
+    suffixes = dict(ENCODINGS)
+    available = [encoding for encoding, suffix in ENCODINGS
+                 if os.path.exists(os.path.join(assets.output, name + suffix))]
+    encoding = accepted_encoding(available)
+    response = send_from_directory(
+        assets.output, name + (suffixes[encoding] if encoding else ''),
+        mimetype=mimetypes.guess_type(name)[0], max_age=assets.max_age)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+class Assets(object):
+    def __init__(self):
+        self.static_folder = None
+        self.static_url_path = '/static'
+        self.output = None
+        self.auto_build = True
+        self.watch = False
+        self.max_age = 31536000
+        self.manifest = None
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.static_folder = app.static_folder
+        self.static_url_path = app.static_url_path
+        self.output = config.get('ASSETS_DIR') or os.path.join(app.static_folder, 'dist')
+        self.auto_build = config.get('ASSETS_AUTO_BUILD', True)
+        self.watch = app.debug
+        self.max_age = config.get('ASSETS_MAX_AGE', 31536000)
+        self.manifest = None
+
+        app.register_blueprint(blueprint)
+        app.jinja_env.globals['asset_urls'] = self.urls
+        min_size = config.get('COMPRESS_MIN_SIZE', 1024)
+        if min_size:
+            app.after_request(lambda response: compress_response(response, min_size))
+        app.extensions['assets'] = self
+
+    def _stale(self):
+        # whether a source changed since the bundles were built
+        newest = max(os.path.getmtime(os.path.join(self.static_folder, source))
+                     for sources in BUNDLES.values() for source in sources)
+        return newest > self._built_at
+
+    def build(self):
+        with self._lock:
+            self.manifest = build(self.static_folder, self.output, self.static_url_path)
+            self._built_at = os.path.getmtime(os.path.join(self.output, MANIFEST))
+            return self.manifest
+
+    def load(self):
+        # the manifest, read once per process; built first if missing and
+        # auto building is on. {} when there is nothing to serve.
+        if self.manifest is not None and not (self.watch and self.manifest and self._stale()):
+            return self.manifest
+        path = os.path.join(self.output, MANIFEST)
+        manifest = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                manifest = json.load(f)
+            self._built_at = os.path.getmtime(path)
+        if set(manifest) != set(BUNDLES) or (self.watch and manifest and self._stale()):
+            manifest = self.build() if self.auto_build else {}
+        self.manifest = manifest
+        return manifest
+
+    def files(self):
+        return set(self.load().values())
+
+    def urls(self, name):
+        # the urls to link for bundle name: the bundle itself, or its
+        # sources when it was not built
+        manifest = self.load()
+        if name in manifest:
+            return [url_for('assets.asset', name=manifest[name])]
+        return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+    def stats(self):
+        manifest = self.load()
+        stats = {'auto_build': self.auto_build, 'bundles': {}}
+        for name, filename in manifest.items():
+            sizes = {'identity': os.path.getsize(os.path.join(self.output, filename))}
+            for encoding, suffix in ENCODINGS:
+                path = os.path.join(self.output, filename + suffix)
+                if os.path.exists(path):
+                    sizes[encoding] = os.path.getsize(path)
+            stats['bundles'][name] = {'file': filename, 'bytes': sizes}
+        return stats
+
+
+def compress_response(response, min_size):
+    # compress a large enough html response for a client that accepts it
+    if response.mimetype != 'text/html':
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or request.method == 'HEAD'):
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    encoding = accepted_encoding(['br', 'gzip'] if _brotli() else ['gzip'])
+    if encoding is None:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # a different representation needs its own strong validator
+        response.set_etag('{}-{}'.format(etag, encoding), weak)
+    return response
@@ -0,0 +1,209 @@
+from datetime import date, datetime, timedelta
+
+from flask import Response, abort, request
+
+from extensions import db
+from models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Availability and calendars.
+#----------------------------------------------------------------------------#
+
+# a venue or artist is busy while one of its shows runs and free otherwise.
+# "who is free" is a NOT EXISTS over the (owner id, start_time) show index,
+# and a calendar is one outer join of the owners to their shows in the
+# range, sorted so each owner's busy windows arrive in order and its free
+# windows are the gaps between them. neither loads shows outside the range.
+
+# the longest range a calendar request may ask for
+MAX_RANGE = timedelta(days=366)
+
+# an iCalendar feed covers the past month and the next eleven by default
+FEED_PAST = timedelta(days=30)
+FEED_FUTURE = timedelta(days=335)
+
+# model -> (its show foreign key, the other side's model and foreign key)
+SIDES = {
+    Venue: (Show.venue_id, Artist, Show.artist_id),
+    Artist: (Show.artist_id, Venue, Show.venue_id),
+}
+
+
+def month_range(month):
+    # the [start, end) datetimes of a 'YYYY-MM' month
+    year, month = (int(part) for part in month.split('-'))
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start, end
+
+
+def parse_range(args, now=None):
+    # the [start, end) range asked for by start and end iso datetimes or a
+    # YYYY-MM month, the current month by default. raises ValueError for a
+    # malformed, empty or too long range.
+    if args.get('start') or args.get('end'):
+        start = datetime.fromisoformat(args.get('start', ''))
+        end = datetime.fromisoformat(args.get('end', ''))
+    else:
+        month = args.get('month') or '{:%Y-%m}'.format(now or date.today())
+        start, end = month_range(month)
+    if not start < end:
+        raise ValueError('the range must end after it starts')
+    if end - start > MAX_RANGE:
+        raise ValueError('the range may not be longer than {} days'.format(MAX_RANGE.days))
+    return start, end
+
+
+def feed_range(args, now=None):
+    # like parse_range, defaulting to the FEED_PAST and FEED_FUTURE window
+    if any(args.get(name) for name in ('start', 'end', 'month')):
+        return parse_range(args)
+    today = datetime.combine(now or date.today(), datetime.min.time())
+    return today - FEED_PAST, today + FEED_FUTURE
+
+
+def overlapping(start, end):
+    # criteria for shows running at some point in [start, end)
+    return (Show.start_time < end, Show.end_time > start)
+
+
+def free_query(query, model, start, end):
+    # narrow a venue or artist query to those with no show in [start, end)
+    foreign_key = SIDES[model][0]
+    busy = db.session.query(Show.id).filter(
+        foreign_key == model.id, *overlapping(start, end))
+    return query.filter(~busy.exists())
+
+
+def calendar(query, model, start, end):
+    # the busy and free windows in [start, end) of every venue or artist in
+    # query, in name order, from a single query
+    foreign_key, other, other_key = SIDES[model]
+    shows = db.session.query(
+        Show.id, foreign_key.label('owner_id'), other_key.label('other_id'),
+        other.name.label('other_name'), Show.start_time, Show.end_time
+    ).join(other, other.id == other_key).filter(
+        *overlapping(start, end)).subquery()
+
+    rows = query.with_entities(
+        model.id, model.name, shows.c.id, shows.c.other_id, shows.c.other_name,
+        shows.c.start_time, shows.c.end_time
+    ).outerjoin(shows, shows.c.owner_id == model.id).order_by(
+        model.name, model.id, shows.c.start_time, shows.c.id)
+
+    other_name = other.__tablename__
+    entries = []
+    entry = None
+    for owner_id, name, show_id, other_id, other_title, show_start, show_end in rows:
+        if entry is None or entry['id'] != owner_id:
+            entry = {'id': owner_id, 'name': name, 'busy': []}
+            entries.append(entry)
+        if show_id is not None:
+            entry['busy'].append({
+                'show_id': show_id,
+                other_name + '_id': other_id,
+                other_name + '_name': other_title,
+                'start_time': show_start,
+                'end_time': show_end,
+            })
+    for entry in entries:
+        entry['free'] = free_windows(entry['busy'], start, end)
+    return entries
+
+
+def free_windows(busy, start, end):
+    # the gaps in [start, end) between busy windows sorted by start time
+    windows = []
+    cursor = start
+    for window in busy:
+        if window['start_time'] > cursor:
+            windows.append({'start_time': cursor, 'end_time': window['start_time']})
+        cursor = max(cursor, window['end_time'])
+    if cursor < end:
+        windows.append({'start_time': cursor, 'end_time': end})
+    return windows
+
+
+#----------------------------------------------------------------------------#
+# iCalendar export.
+#----------------------------------------------------------------------------#
+
+def _ics_text(value):
+    # escape a TEXT value (RFC 5545 3.3.11)
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(
+        ',', '\\,').replace('\n', '\\n')
+
+
+def _ics_time(value):
+    # shows are stored in the venue's local time, so they are written as
+    # floating times rather than converted to UTC
+    return value.strftime('%Y%m%dT%H%M%S')
+
+
+def _fold(line):
+    # content lines are folded at 75 octets
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # do not split a multibyte character
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode('utf-8'))
+        encoded = encoded[size:]
+    return '\r\n '.join(parts)
+
+
+def to_ics(entry, model, stamp=None):
+    # a VCALENDAR of one calendar() entry's shows
+    other_name = SIDES[model][1].__tablename__
+    stamp = _ics_time(stamp or datetime.utcnow()) + 'Z'
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Fyyur//Show calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'X-WR-CALNAME:' + _ics_text(entry['name']),
+    ]
+    for show in entry['busy']:
+        if model is Venue:
+            summary = '{} at {}'.format(show['artist_name'], entry['name'])
+            location = entry['name']
+        else:
+            summary = '{} at {}'.format(entry['name'], show['venue_name'])
+            location = show['venue_name']
+        lines.extend([
+            'BEGIN:VEVENT',
+            'UID:show-{}@fyyur'.format(show['show_id']),
+            'DTSTAMP:' + stamp,
+            'DTSTART:' + _ics_time(show['start_time']),
+            'DTEND:' + _ics_time(show['end_time']),
+            'SUMMARY:' + _ics_text(summary),
+            'LOCATION:' + _ics_text(location),
+            'X-FYYUR-{}-ID:{}'.format(other_name.upper(), show[other_name + '_id']),
+            'END:VEVENT',
+        ])
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+#----------------------------------------------------------------------------#
+# Calendar feeds.
+#----------------------------------------------------------------------------#
+
+def calendar_feed(model, owner_id):
+    # one venue's or artist's shows as an iCalendar file, for the range in
+    # ?start=&end= or ?month=, by default the past month and the next eleven
+    try:
+        start, end = feed_range(request.args)
+    except ValueError:
+        abort(400)
+
+    entries = calendar(model.query.filter(model.id == owner_id), model, start, end)
+    if not entries:
+        abort(404)
+    return Response(to_ics(entries[0], model), mimetype='text/calendar', headers={
+        'Content-Disposition': 'attachment; filename={}-{}.ics'.format(
+            model.__tablename__, owner_id)})
@@ -0,0 +1,154 @@
+"""Concurrent read benchmark for Fyyur.
+
+Serves the app from a threaded WSGI server and has N clients (500 by
+default) request the listings and the venue and artist detail pages, HTML
+and JSON, as fast as they can: first with the sync read path, then with
+ASYNC_READS, which reads them on the async engine, running each detail
+page's queries concurrently. Reports throughput
+and latency percentiles for both:
+
+    python -m benchmarks.concurrency
+    python -m benchmarks.concurrency --clients 500 --requests 20
+
+The page cache is off so every request reaches the database. By
+default it runs on a throwaway SQLite database; pass --database with a
+PostgreSQL URL (and --reset, which drops all tables) for numbers that
+mean something for production.
+"""
+import argparse
+import http.client
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.run import HERE, percentile
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL; defaults to a temporary SQLite file')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate all tables first (required for an existing database)')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.1)
+    parser.add_argument('--clients', type=int, default=500, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=10, help='requests per client')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per request, in seconds')
+    parser.add_argument('--seed', type=int, default=1234)
+    return parser.parse_args(argv)
+
+
+def client(port, urls, timeout, timings, errors, start):
+    # one keep-alive-less client working through urls
+    start.wait()
+    for url in urls:
+        began = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+            connection.request('GET', url)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(type(error).__name__)
+            continue
+        timings.append((time.perf_counter() - began) * 1000)
+
+
+def drive(port, plans, timeout):
+    # run one client thread per plan at once; returns (seconds, timings, errors)
+    timings, errors = [], []
+    start = threading.Event()
+    threads = [threading.Thread(target=client, args=(port, urls, timeout, timings, errors, start))
+               for urls in plans]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - began, sorted(timings), errors
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = database
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(HERE))
+
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from cache import MemoryBackend
+    from extensions import db, cache, reads
+    from benchmarks.datagen import generate, zipf_weights
+
+    app = create_app()
+
+    cache.backend = MemoryBackend(max_entries=0)
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        venue_ids, artist_ids = generate(args.venues, args.artists, args.shows,
+                                         skew=args.skew, seed=args.seed)
+
+    rng = random.Random(args.seed)
+    venue_weights = zipf_weights(len(venue_ids), args.skew)
+    artist_weights = zipf_weights(len(artist_ids), args.skew)
+
+    # first pages of the listings read on the async path, between the
+    # detail pages
+    listings = ['/venues', '/artists', '/shows', '/api/v1/venues', '/api/v1/artists']
+
+    def url():
+        if rng.random() < 0.25:
+            return rng.choice(listings)
+        kind = rng.choice(['venues', 'artists'])
+        ids, weights = (venue_ids, venue_weights) if kind == 'venues' else (artist_ids, artist_weights)
+        prefix = rng.choice(['', '/api/v1'])
+        return '{}/{}/{}'.format(prefix, kind, rng.choices(ids, cum_weights=weights)[0])
+
+    plans = [[url() for _ in range(args.requests)] for _ in range(args.clients)]
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    # every client connects at once; the default backlog would drop most
+    server.socket.listen(max(args.clients, 128))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    results = []
+    for name, enabled in (('sync', False), ('async', True)):
+        reads.enabled = enabled
+        # warm up the pools, templates and statement caches
+        drive(port, [plans[0][:2]], args.timeout)
+        seconds, timings, errors = drive(port, plans, args.timeout)
+        results.append((name, len(timings) / seconds, timings, errors))
+    server.shutdown()
+    reads.dispose()
+
+    print('{} clients x {} requests, {}'.format(
+        args.clients, args.requests, database.split(':', 1)[0]))
+    print('{:<8}{:>10}{:>10}{:>10}{:>10}{:>8}'.format(
+        'reads', 'req/s', 'p50', 'p95', 'p99', 'errors'))
+    for name, throughput, timings, errors in results:
+        print('{:<8}{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>8}'.format(
+            name, throughput, percentile(timings, 0.50) or 0,
+            percentile(timings, 0.95) or 0, percentile(timings, 0.99) or 0, len(errors)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
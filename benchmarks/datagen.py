@@ -0,0 +1,155 @@
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import counters
+import feed
+from conflicts import IntervalIndex
+from extensions import db
+from formatting import to_utc
+from models import Venue, Artist, Show, Genre, GENRES, DEFAULT_SHOW_DURATION
+
+#----------------------------------------------------------------------------#
+# Synthetic catalog for the benchmarks.
+#----------------------------------------------------------------------------#
+
+# show placement follows a zipf-like distribution, so a handful of popular
+# venues and artists carry most of the shows, as they do in production.
+
+AREAS = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'),
+         ('Chicago', 'IL'), ('Seattle', 'WA'), ('Nashville', 'TN'),
+         ('New Orleans', 'LA'), ('Portland', 'OR'), ('Denver', 'CO'),
+         ('Boston', 'MA')]
+
+# city centres; venues are scattered up to CITY_SPREAD degrees around them
+CENTRES = {
+    ('San Francisco', 'CA'): (37.7749, -122.4194),
+    ('New York', 'NY'): (40.7128, -74.0060),
+    ('Austin', 'TX'): (30.2672, -97.7431),
+    ('Chicago', 'IL'): (41.8781, -87.6298),
+    ('Seattle', 'WA'): (47.6062, -122.3321),
+    ('Nashville', 'TN'): (36.1627, -86.7816),
+    ('New Orleans', 'LA'): (29.9511, -90.0715),
+    ('Portland', 'OR'): (45.5152, -122.6784),
+    ('Denver', 'CO'): (39.7392, -104.9903),
+    ('Boston', 'MA'): (42.3601, -71.0589),
+}
+CITY_SPREAD = 0.25
+
+TIMEZONES = {
+    'CA': 'America/Los_Angeles', 'NY': 'America/New_York', 'TX': 'America/Chicago',
+    'IL': 'America/Chicago', 'WA': 'America/Los_Angeles', 'TN': 'America/Chicago',
+    'LA': 'America/Chicago', 'OR': 'America/Los_Angeles', 'CO': 'America/Denver',
+    'MA': 'America/New_York',
+}
+
+WORDS = ['Musical', 'Hop', 'Dueling', 'Pianos', 'Park', 'Square', 'Live',
+         'Hall', 'Wild', 'Sax', 'Band', 'Guns', 'Petals', 'Blue', 'Note',
+         'Velvet', 'Room', 'Echo', 'Lounge', 'Garden']
+
+
+def zipf_weights(n, skew):
+    # cumulative weights for random.choices, most popular first
+    return list(accumulate(1.0 / (rank ** skew) for rank in range(1, n + 1)))
+
+
+def _name(rng, index):
+    return '{} {} {}'.format(rng.choice(WORDS), rng.choice(WORDS), index)
+
+
+def _profile(rng, index):
+    city, state = rng.choice(AREAS)
+    return {
+        'name': _name(rng, index),
+        'city': city,
+        'state': state,
+        'phone': '555-{:03d}-{:04d}'.format(index % 1000, index % 10000),
+        'image_link': 'https://images.example.com/{}.jpg'.format(index),
+        'facebook_link': 'https://www.facebook.com/{}'.format(index),
+        'website': 'https://example.com/{}'.format(index),
+        'seeking_description': 'Looking for a great night.',
+    }
+
+
+def _insert(table, rows, batch_size=1000):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+
+
+def _link_genres(model, ids, rng):
+    # one to three genres per venue or artist
+    link = model.genre_objects.property.secondary
+    owner_column = '{}_id'.format(model.__tablename__)
+    genre_ids = dict(db.session.query(Genre.name, Genre.id))
+    _insert(link, [{owner_column: owner_id, 'genre_id': genre_ids[name]}
+                   for owner_id in ids
+                   for name in rng.sample(GENRES, rng.randint(1, 3))])
+
+
+def generate(venues=500, artists=500, shows=5000, skew=1.1, seed=1234, now=None):
+    # fill an empty database; returns the (venue ids, artist ids) ordered
+    # from most to least popular
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+
+    # coordinates come from their own generator so the rest of the data
+    # stays the same for a seed
+    geo_rng = random.Random(seed + 1)
+    venue_rows = []
+    for index in range(venues):
+        row = _profile(rng, index)
+        lat, lng = CENTRES[row['city'], row['state']]
+        row.update(address='{} Main St'.format(index), seeking_talent=index % 3 == 0,
+                   latitude=lat + geo_rng.uniform(-CITY_SPREAD, CITY_SPREAD),
+                   longitude=lng + geo_rng.uniform(-CITY_SPREAD, CITY_SPREAD),
+                   timezone=TIMEZONES[row['state']])
+        venue_rows.append(row)
+    _insert(Venue.__table__, venue_rows)
+
+    artist_rows = []
+    for index in range(artists):
+        row = _profile(rng, index)
+        row.update(seeking_venue=index % 4 == 0)
+        artist_rows.append(row)
+    _insert(Artist.__table__, artist_rows)
+    db.session.commit()
+
+    venue_timezones = dict(db.session.query(Venue.id, Venue.timezone))
+    venue_ids = sorted(venue_timezones)
+    artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).order_by(Artist.id)]
+    _link_genres(Venue, venue_ids, rng)
+    _link_genres(Artist, artist_ids, rng)
+
+    venue_weights = zipf_weights(len(venue_ids), skew)
+    artist_weights = zipf_weights(len(artist_ids), skew)
+
+    # shows spread over the past and next six months. draws that would
+    # double book a venue or artist are redrawn, as the schema forbids them.
+    bookings = defaultdict(IntervalIndex)
+    show_rows = []
+    while len(show_rows) < shows:
+        venue_id = rng.choices(venue_ids, cum_weights=venue_weights)[0]
+        artist_id = rng.choices(artist_ids, cum_weights=artist_weights)[0]
+        start_time = now + timedelta(minutes=rng.randint(-180 * 24 * 60, 180 * 24 * 60))
+        end_time = start_time + DEFAULT_SHOW_DURATION
+        if bookings['venue', venue_id].overlapping(start_time, end_time) or \
+                bookings['artist', artist_id].overlapping(start_time, end_time):
+            continue
+        bookings['venue', venue_id].add(start_time, end_time, None)
+        bookings['artist', artist_id].add(start_time, end_time, None)
+        show_rows.append({
+            'venue_id': venue_id,
+            'artist_id': artist_id,
+            'start_time': start_time,
+            'end_time': end_time,
+            'starts_at': to_utc(start_time, venue_timezones[venue_id]),
+        })
+    _insert(Show.__table__, show_rows)
+    counters.recount(Venue, now=now)
+    counters.recount(Artist, now=now)
+    db.session.commit()
+    if feed.uses_view():
+        feed.refresh(concurrently=False)
+
+    return venue_ids, artist_ids
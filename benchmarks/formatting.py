@@ -0,0 +1,92 @@
+"""Datetime filter benchmark for Fyyur.
+
+Formats the start times of a page of synthetic shows with the original
+filter (dateutil parsing plus babel.dates.format_datetime on every call)
+and with formatting.format_datetime, and reports the cost per show tile:
+
+    python -m benchmarks.formatting
+    python -m benchmarks.formatting --shows 10000 --min-speedup 10
+
+The new filter is measured cold (memo cleared) and warm (a second render
+of the same page).
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from formatting import format_datetime, _format, _date_fields, _time_fields, _zone_memo
+from benchmarks.datagen import TIMEZONES
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=180,
+                        help='how many days the show start times are spread over')
+    parser.add_argument('--format', default='full')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--min-speedup', type=float,
+                        help='exit non-zero if the cold speedup is below this')
+    return parser.parse_args(argv)
+
+
+def old_format_datetime(value, format='medium'):
+    # the filter as it was before formatting.py
+    if(isinstance(value, str)):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def shows(count, days, seed):
+    # (start time, venue timezone) pairs on the half hour, like real listings
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    zones = sorted(set(TIMEZONES.values()))
+    return [(start + timedelta(minutes=30 * rng.randrange(days * 48)), rng.choice(zones))
+            for _ in range(count)]
+
+
+def per_tile(render, rows):
+    started = time.perf_counter()
+    render(rows)
+    return (time.perf_counter() - started) / len(rows) * 1e6
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = shows(args.shows, args.days, args.seed)
+
+    # the old page passed start times as strings and ignored the timezone
+    old = per_tile(lambda rows: [old_format_datetime(str(value), args.format)
+                                 for value, zone in rows], rows)
+    for memo in (_format, _date_fields, _time_fields):
+        memo.cache_clear()
+    _zone_memo.clear()
+    render = lambda rows: [format_datetime(value, args.format, zone) for value, zone in rows]
+    cold = per_tile(render, rows)
+    warm = per_tile(render, rows)
+
+    print('{} shows over {} days, format {!r}'.format(args.shows, args.days, args.format))
+    print('{:<8}{:>12}{:>10}'.format('filter', 'us/tile', 'speedup'))
+    for name, cost in (('old', old), ('cold', cold), ('warm', warm)):
+        print('{:<8}{:>12.2f}{:>9.1f}x'.format(name, cost, old / cost))
+
+    if args.min_speedup and old / cold < args.min_speedup:
+        print('FAIL: cold speedup {:.1f}x is below {}x'.format(old / cold, args.min_speedup))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
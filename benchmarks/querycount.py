@@ -0,0 +1,112 @@
+"""Query count regression check for Fyyur.
+
+Renders the listing and detail pages against a small and a larger
+synthetic catalog and counts the SQL statements each request runs. A page
+whose count grows with the catalog issues a query per row (an N+1) and
+fails the check:
+
+    python -m benchmarks.querycount
+    python -m benchmarks.querycount --sizes 2 50 200
+
+Each size gets its own throwaway SQLite database with that many venues
+and artists and ten shows per venue. The detail page cache and the
+fragment cache are off so every request reaches the database.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+from benchmarks.run import HERE
+
+# (name, url factory taking the most popular venue and artist ids)
+PAGES = [
+    ('/venues', lambda venue_id, artist_id: '/venues?limit=100'),
+    ('/venues?genre', lambda venue_id, artist_id: '/venues?limit=100&genre=Jazz'),
+    ('/artists', lambda venue_id, artist_id: '/artists?limit=100'),
+    ('/shows', lambda venue_id, artist_id: '/shows?limit=100'),
+    ('/venues/<id>', lambda venue_id, artist_id: '/venues/{}'.format(venue_id)),
+    ('/artists/<id>', lambda venue_id, artist_id: '/artists/{}'.format(artist_id)),
+    ('/api/v1/venues', lambda venue_id, artist_id: '/api/v1/venues?limit=100'),
+    ('/api/v1/shows', lambda venue_id, artist_id: '/api/v1/shows?limit=100'),
+    ('/api/v1/venues/<id>', lambda venue_id, artist_id: '/api/v1/venues/{}'.format(venue_id)),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2, 50],
+                        help='venues (and artists) in each catalog')
+    parser.add_argument('--seed', type=int, default=1234)
+    return parser.parse_args(argv)
+
+
+def count_queries(size, seed):
+    # {page name: statements run by one request} for a catalog of size
+    import config
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import create_app
+    from cache import MemoryBackend
+    from extensions import db, cache, fragments
+    from benchmarks.datagen import generate
+
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    settings['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'counts.db')
+    settings['SQLALCHEMY_ENGINE_OPTIONS'] = {}
+    app = create_app(SimpleNamespace(**settings))
+    cache.backend = MemoryBackend(max_entries=0)
+    fragments.enabled = False
+
+    with app.app_context():
+        db.create_all()
+        venue_ids, artist_ids = generate(size, size, size * 10, seed=seed)
+
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+
+    client = app.test_client()
+    counts = {}
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        for name, url in PAGES:
+            url = url(venue_ids[0], artist_ids[0])
+            # one untimed request for lazily loaded state
+            client.get(url)
+            queries[0] = 0
+            status = client.get(url).status_code
+            if status != 200:
+                raise SystemExit('{} answered {}'.format(url, status))
+            counts[name] = queries[0]
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+    with app.app_context():
+        db.engine.dispose()
+    return counts
+
+
+def run(args):
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(HERE))
+
+    results = [count_queries(size, args.seed) for size in args.sizes]
+
+    print('{:<24}'.format('page') + ''.join('{:>10}'.format(size) for size in args.sizes))
+    growing = []
+    for name, _ in PAGES:
+        counts = [result[name] for result in results]
+        print('{:<24}'.format(name) + ''.join('{:>10}'.format(count) for count in counts))
+        if len(set(counts)) > 1:
+            growing.append(name)
+    if growing:
+        print('query count grows with the catalog: ' + ', '.join(growing))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,295 @@
+"""Route benchmark for Fyyur.
+
+Generates a synthetic catalog, drives every route through the Flask test
+client and reports p50/p95/p99 latency and queries per request for each,
+plus the process's peak RSS. Results can be saved as the baseline and
+later runs checked against it:
+
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --check
+
+By default it runs on a throwaway SQLite database; pass --database with a
+PostgreSQL URL (and --reset, which drops all tables) to benchmark the real
+thing.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'baseline.json')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL; defaults to a temporary SQLite file')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate all tables first (required for an existing database)')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.1,
+                        help='zipf exponent for how shows concentrate on popular venues and artists')
+    parser.add_argument('--requests', type=int, default=100, help='requests per route')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the detail page cache on (off by default so query counts are comparable)')
+    parser.add_argument('--save-baseline', action='store_true', help='write results to ' + BASELINE)
+    parser.add_argument('--check', action='store_true', help='fail if results regress against the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='allowed latency / RSS growth over the baseline, as a ratio')
+    parser.add_argument('--slack-ms', type=float, default=5.0,
+                        help='latency growth always allowed, so millisecond routes don\'t flap')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    return parser.parse_args(argv)
+
+
+def percentile(sorted_values, fraction):
+    # nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return None
+    index = max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def routes(pick_venue, pick_artist, rng):
+    # (name, method, url factory, form data factory) for every route.
+    # /delete/<venue_id> is left out: it would remove the catalog under
+    # the other routes.
+    from extensions import assets
+
+    def venue_form():
+        return {'name': 'Bench Venue {}'.format(rng.random()), 'city': 'Austin',
+                'state': 'TX', 'address': '1 Main St', 'phone': '555-000-0000',
+                'genres': ['Jazz'], 'facebook_link': 'https://www.facebook.com/bench'}
+
+    def artist_form():
+        return {'name': 'Bench Artist {}'.format(rng.random()), 'city': 'Austin',
+                'state': 'TX', 'phone': '555-000-0000', 'genres': ['Jazz'],
+                'facebook_link': 'https://www.facebook.com/bench'}
+
+    def show_form():
+        return {'artist_id': str(pick_artist()), 'venue_id': str(pick_venue()),
+                'start_time': '2031-01-01 20:00:00'}
+
+    def search_form():
+        return {'search_term': rng.choice(['hop', 'band', 'jazz', 'park', 'blue note'])}
+
+    return [
+        ('main.index', 'GET', lambda: '/', None),
+        ('venues.venues', 'GET', lambda: '/venues', None),
+        ('venues.search_venues', 'POST', lambda: '/venues/search', search_form),
+        ('venues.venues_near', 'GET', lambda: '/venues/near?lat=30.2672&lng=-97.7431&radius=15', None),
+        ('venues.show_venue', 'GET', lambda: '/venues/{}'.format(pick_venue()), None),
+        ('venues.create_venue_form', 'GET', lambda: '/venues/create', None),
+        ('venues.create_venue_submission', 'POST', lambda: '/venues/create', venue_form),
+        ('venues.edit_venue', 'GET', lambda: '/venues/{}/edit'.format(pick_venue()), None),
+        ('venues.edit_venue_submission', 'POST', lambda: '/venues/{}/edit'.format(pick_venue()), venue_form),
+        ('artists.artists', 'GET', lambda: '/artists', None),
+        ('artists.search_artists', 'POST', lambda: '/artists/search', search_form),
+        ('artists.show_artist', 'GET', lambda: '/artists/{}'.format(pick_artist()), None),
+        ('artists.create_artist_form', 'GET', lambda: '/artists/create', None),
+        ('artists.create_artist_submission', 'POST', lambda: '/artists/create', artist_form),
+        ('artists.edit_artist', 'GET', lambda: '/artists/{}/edit'.format(pick_artist()), None),
+        ('artists.edit_artist_submission', 'POST', lambda: '/artists/{}/edit'.format(pick_artist()), artist_form),
+        ('shows.shows', 'GET', lambda: '/shows', None),
+        ('shows.shows?city', 'GET', lambda: '/shows?city=Austin', None),
+        ('shows.create_shows', 'GET', lambda: '/shows/create', None),
+        ('shows.create_show_submission', 'POST', lambda: '/shows/create', show_form),
+        ('main.export', 'GET', lambda: '/export/shows.csv', None),
+        ('main.cache_stats', 'GET', lambda: '/internal/cache', None),
+        ('main.fragment_stats', 'GET', lambda: '/internal/fragments', None),
+        ('main.pool_stats', 'GET', lambda: '/internal/pool', None),
+        ('main.task_stats', 'GET', lambda: '/internal/tasks', None),
+        ('main.feed_stats', 'GET', lambda: '/internal/feed', None),
+        ('main.asset_stats', 'GET', lambda: '/internal/assets', None),
+        ('assets.asset', 'GET', lambda: '/assets/' + assets.load()['fyyur.css'], None),
+        ('main.job_status', 'GET', lambda: '/jobs/{}'.format(rng.getrandbits(128)), None),
+        ('api.venues', 'GET', lambda: '/api/v1/venues', None),
+        ('api.venue', 'GET', lambda: '/api/v1/venues/{}'.format(pick_venue()), None),
+        ('api.artists', 'GET', lambda: '/api/v1/artists', None),
+        ('api.artist', 'GET', lambda: '/api/v1/artists/{}'.format(pick_artist()), None),
+        ('api.shows', 'GET', lambda: '/api/v1/shows', None),
+        ('venues.venue_calendar', 'GET', lambda: '/venues/{}/calendar.ics'.format(pick_venue()), None),
+        ('artists.artist_calendar', 'GET', lambda: '/artists/{}/calendar.ics'.format(pick_artist()), None),
+        ('api.available_venues', 'GET', lambda: '/api/v1/venues/available', None),
+        ('api.available_artists', 'GET', lambda: '/api/v1/artists/available', None),
+        ('api.venues_calendar', 'GET', lambda: '/api/v1/venues/calendar', None),
+        ('api.artists_calendar', 'GET', lambda: '/api/v1/artists/calendar', None),
+        ('api.venue_calendar', 'GET', lambda: '/api/v1/venues/{}/calendar'.format(pick_venue()), None),
+        ('api.artist_calendar', 'GET', lambda: '/api/v1/artists/{}/calendar'.format(pick_artist()), None),
+    ]
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    # config.py reads DATABASE_URL at import time. background jobs are
+    # drained between requests, outside the timings
+    os.environ['DATABASE_URL'] = database
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(HERE))
+
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app import create_app
+    from cache import MemoryBackend
+    from extensions import db, cache, queue
+    from benchmarks.datagen import generate, zipf_weights
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['INTERNAL_TOKEN'] = 'benchmark'
+    if not args.cache:
+        cache.backend = MemoryBackend(max_entries=0)
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        venue_ids, artist_ids = generate(args.venues, args.artists, args.shows,
+                                         skew=args.skew, seed=args.seed)
+        generate_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    venue_weights = zipf_weights(len(venue_ids), args.skew)
+    artist_weights = zipf_weights(len(artist_ids), args.skew)
+
+    def pick_venue():
+        return rng.choices(venue_ids, cum_weights=venue_weights)[0]
+
+    def pick_artist():
+        return rng.choices(artist_ids, cum_weights=artist_weights)[0]
+
+    queries = [0]
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_query(*args):
+        queries[0] += 1
+
+    client = app.test_client()
+    client.environ_base['HTTP_AUTHORIZATION'] = 'Bearer benchmark'
+    plan = routes(pick_venue, pick_artist, rng)
+
+    covered = {name for name, _, _, _ in plan} | {'venues.delete_venue', 'static'}
+    uncovered = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered)
+
+    results = {}
+    for name, method, url, data in plan:
+        # one untimed request so template compilation and statement
+        # caching don't land in the percentiles
+        client.open(url(), method=method, data=data() if data else None)
+        queue.broker.run_pending()
+
+        timings = []
+        query_count = 0
+        for _ in range(args.requests):
+            target = url()
+            form = data() if data else None
+            queries[0] = 0
+            start = time.perf_counter()
+            response = client.open(target, method=method, data=form)
+            response.get_data()
+            timings.append((time.perf_counter() - start) * 1000)
+            query_count += queries[0]
+            queue.broker.run_pending()
+            if response.status_code >= 500:
+                raise SystemExit('{} {} returned {}'.format(method, target, response.status_code))
+        timings.sort()
+        results[name] = {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': round(query_count / float(args.requests), 2),
+        }
+
+    return {
+        'params': {
+            'dialect': database.split(':', 1)[0],
+            'venues': args.venues,
+            'artists': args.artists,
+            'shows': args.shows,
+            'skew': args.skew,
+            'requests': args.requests,
+            'cache': args.cache,
+        },
+        'generate_seconds': round(generate_seconds, 3),
+        # ru_maxrss is in kilobytes on linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+        'uncovered_routes': uncovered,
+        'routes': results,
+    }
+
+
+def compare(results, baseline, tolerance, slack_ms=0.0):
+    # list of regressions of results against baseline
+    problems = []
+    if results['params'] != baseline['params']:
+        problems.append('parameters differ from the baseline: {} vs {}'.format(
+            results['params'], baseline['params']))
+        return problems
+
+    for name, base in sorted(baseline['routes'].items()):
+        current = results['routes'].get(name)
+        if current is None:
+            problems.append('{}: missing from this run'.format(name))
+            continue
+        if current['queries'] > base['queries']:
+            problems.append('{}: {} queries per request, baseline {}'.format(
+                name, current['queries'], base['queries']))
+        if current['p95_ms'] > base['p95_ms'] * tolerance + slack_ms:
+            problems.append('{}: p95 {}ms, baseline {}ms'.format(
+                name, current['p95_ms'], base['p95_ms']))
+
+    if results['peak_rss_mb'] > baseline['peak_rss_mb'] * tolerance:
+        problems.append('peak RSS {}MB, baseline {}MB'.format(
+            results['peak_rss_mb'], baseline['peak_rss_mb']))
+    return problems
+
+
+def report(results):
+    print('{:<26} {:>9} {:>9} {:>9} {:>8}'.format('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries'))
+    for name, result in results['routes'].items():
+        print('{:<26} {:>9} {:>9} {:>9} {:>8}'.format(
+            name, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries']))
+    print('peak RSS {}MB, data generated in {}s'.format(
+        results['peak_rss_mb'], results['generate_seconds']))
+    if results['uncovered_routes']:
+        print('not benchmarked: ' + ', '.join(results['uncovered_routes']))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+
+    if args.save_baseline:
+        with open(BASELINE, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+
+    if args.check:
+        with open(BASELINE) as baseline_file:
+            baseline = json.load(baseline_file)
+        problems = compare(results, baseline, args.tolerance, args.slack_ms)
+        for problem in problems:
+            print('REGRESSION ' + problem)
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
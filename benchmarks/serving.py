@@ -0,0 +1,150 @@
+"""Production serving benchmark for Fyyur.
+
+Starts gunicorn with gunicorn.conf.py against a synthetic catalog and
+reports how long it takes until it answers, then the throughput and
+latency of a mix of listing and detail pages under concurrent clients.
+The same run is repeated without preload_app for comparison:
+
+    python -m benchmarks.serving
+    python -m benchmarks.serving --workers 4 --threads 8 --clients 200
+
+By default it runs on a throwaway SQLite database; pass --database with a
+PostgreSQL URL (and --reset, which drops all tables) to benchmark the real
+thing.
+"""
+import argparse
+import http.client
+import os
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.run import HERE, percentile
+from benchmarks.concurrency import drive
+
+ROOT = os.path.dirname(HERE)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL; defaults to a temporary SQLite file')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate all tables first (required for an existing database)')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--workers', type=int, help='defaults to the gunicorn.conf.py value')
+    parser.add_argument('--threads', type=int, help='defaults to the gunicorn.conf.py value')
+    parser.add_argument('--clients', type=int, default=100, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=20, help='requests per client')
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='per request and for startup, in seconds')
+    parser.add_argument('--seed', type=int, default=1234)
+    return parser.parse_args(argv)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(port, timeout):
+    # seconds until / answers 200
+    began = time.perf_counter()
+    while time.perf_counter() - began < timeout:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return time.perf_counter() - began
+        except (OSError, http.client.HTTPException):
+            pass
+        time.sleep(0.01)
+    raise SystemExit('gunicorn did not answer within {}s'.format(timeout))
+
+
+def serve(env, args, plans, preload):
+    # start gunicorn, time its startup, drive plans through it and stop it
+    env = dict(env, GUNICORN_PRELOAD='true' if preload else 'false')
+    port = free_port()
+    began = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--bind', '127.0.0.1:{}'.format(port), 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_serving(port, args.timeout)
+        startup = time.perf_counter() - began
+        seconds, timings, errors = drive(port, plans, args.timeout)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    return startup, len(timings) / seconds, timings, errors
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = database
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, ROOT)
+
+    from app import create_app
+    from extensions import db
+    from benchmarks.datagen import generate
+
+    app = create_app()
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        venue_ids, artist_ids = generate(args.venues, args.artists, args.shows, seed=args.seed)
+        db.session.remove()
+        db.engine.dispose()
+
+    rng = random.Random(args.seed)
+    pages = [
+        lambda: '/venues',
+        lambda: '/artists',
+        lambda: '/shows',
+        lambda: '/venues/{}'.format(rng.choice(venue_ids)),
+        lambda: '/artists/{}'.format(rng.choice(artist_ids)),
+        lambda: '/api/v1/venues/{}'.format(rng.choice(venue_ids)),
+    ]
+    plans = [[rng.choice(pages)() for _ in range(args.requests)]
+             for _ in range(args.clients)]
+
+    # gunicorn.conf.py refuses per-worker page caches, so the pages are
+    # served uncached unless the environment names a shared backend
+    env = dict(os.environ, SECRET_KEY=secrets.token_hex(32),
+               GUNICORN_ACCESS_LOG='/dev/null', PYTHONWARNINGS='ignore')
+    if env.get('CACHE_BACKEND', 'memory') == 'memory':
+        env['CACHE_MAX_ENTRIES'] = '0'
+    if args.workers:
+        env['WEB_CONCURRENCY'] = str(args.workers)
+    if args.threads:
+        env['GUNICORN_THREADS'] = str(args.threads)
+
+    print('{} clients x {} requests, {}'.format(
+        args.clients, args.requests, database.split(':', 1)[0]))
+    print('{:<12}{:>10}{:>10}{:>10}{:>10}{:>10}{:>8}'.format(
+        'preload', 'startup', 'req/s', 'p50', 'p95', 'p99', 'errors'))
+    for preload in (True, False):
+        startup, throughput, timings, errors = serve(env, args, plans, preload)
+        print('{:<12}{:>9.2f}s{:>10.1f}{:>10.1f}{:>10.1f}{:>10.1f}{:>8}'.format(
+            'on' if preload else 'off', startup, throughput,
+            percentile(timings, 0.50) or 0, percentile(timings, 0.95) or 0,
+            percentile(timings, 0.99) or 0, len(errors)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,98 @@
+"""Cold-start benchmark for Fyyur.
+
+Starts a fresh interpreter for every run and times importing app, building
+the app with create_app() and answering the first request to /, then
+reports the median of each and which of the heavy modules ended up loaded:
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 20 --max-startup 0.5
+
+The database is created (on a throwaway SQLite file unless --database is
+given) before the runs, so they time the app and not the schema.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.run import HERE
+
+ROOT = os.path.dirname(HERE)
+
+# modules create_app() should not need; loaded on first use instead
+HEAVY = ['babel', 'dateutil', 'flask_migrate', 'alembic', 'flask_wtf', 'forms', 'exporter']
+
+PROBE = '''
+import json, sys, time
+began = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+loaded = [name for name in {heavy!r} if name in sys.modules]
+response = application.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({{'import': imported - began, 'create_app': created - imported,
+                   'first_request': served - created, 'status': response.status_code,
+                   'loaded': loaded}}))
+'''
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL; defaults to a temporary SQLite file')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--max-startup', type=float,
+                        help='exit non-zero if the median import + create_app exceeds this, in seconds')
+    return parser.parse_args(argv)
+
+
+def probe(env):
+    # one cold start in a fresh interpreter
+    output = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', PROBE.format(heavy=HEAVY)],
+        cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = database
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, ROOT)
+
+    from app import create_app
+    from extensions import db
+
+    with create_app().app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    env = dict(os.environ)
+    env.pop('FLASK_RUN_FROM_CLI', None)
+    results = [probe(env) for _ in range(args.runs)]
+    if any(result['status'] != 200 for result in results):
+        raise SystemExit('/ did not answer 200')
+
+    print('{} runs, {}'.format(args.runs, database.split(':', 1)[0]))
+    print('{:<16}{:>10}{:>10}'.format('phase', 'median', 'max'))
+    for phase in ('import', 'create_app', 'first_request'):
+        timings = [result[phase] * 1000 for result in results]
+        print('{:<16}{:>8.1f}ms{:>8.1f}ms'.format(phase, statistics.median(timings), max(timings)))
+    loaded = sorted(set().union(*[result['loaded'] for result in results]))
+    print('heavy modules loaded by create_app: {}'.format(', '.join(loaded) or 'none'))
+
+    startup = statistics.median(result['import'] + result['create_app'] for result in results)
+    if args.max_startup is not None and startup > args.max_startup:
+        print('startup {:.3f}s exceeds {:.3f}s'.format(startup, args.max_startup))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,184 @@
+"""Page weight benchmark for Fyyur.
+
+Loads the venue pages (/venues and venue detail pages) the way a browser
+would, the HTML and every local stylesheet and script it links, once with
+the asset pipeline and HTML compression off (the individual files under
+/static) and once with them on, and reports for a first and a repeat visit:
+
+    python -m benchmarks.transfer
+    python -m benchmarks.transfer --rtt 150 --bandwidth 1.6
+
+- bytes: response bodies transferred
+- requests: round trips made, counting revalidations (304s) on a repeat
+  visit; immutable bundles are not requested again at all
+- server: median time to produce the HTML, compression included
+- first paint: an estimate for a link of --rtt and --bandwidth: the HTML,
+  then one more round trip for the render-blocking stylesheets and head
+  scripts, fetched in parallel, plus their transfer time
+
+The estimate leaves out DNS, TLS and TCP slow start, so read it for the
+difference between the two runs rather than as a real paint time.
+"""
+import argparse
+import gzip
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from benchmarks.run import HERE
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+_head = re.compile(r'<head>(.*?)</head>', re.S)
+# conditional comments and inline scripts (the jquery fallback) hold
+# script tags a browser normally never loads
+_skipped = re.compile(r'<!--.*?-->|<script>.*?</script>', re.S)
+_stylesheet = re.compile(r'<link[^>]+rel="stylesheet"[^>]+href="(/[^"/][^"]*)"')
+_script = re.compile(r'<script([^>]*)src="(/[^"/][^"]*)"([^>]*)>')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', help='SQLAlchemy URL; defaults to a temporary SQLite file')
+    parser.add_argument('--reset', action='store_true',
+                        help='drop and recreate all tables first (required for an existing database)')
+    parser.add_argument('--venues', type=int, default=200)
+    parser.add_argument('--artists', type=int, default=200)
+    parser.add_argument('--shows', type=int, default=4000)
+    parser.add_argument('--pages', type=int, default=20, help='venue detail pages loaded')
+    parser.add_argument('--rtt', type=float, default=150.0, help='round trip time, in ms')
+    parser.add_argument('--bandwidth', type=float, default=1.6, help='in Mbit/s')
+    parser.add_argument('--seed', type=int, default=1234)
+    return parser.parse_args(argv)
+
+
+def subresources(html):
+    # (url, render blocking) for every local stylesheet and script
+    html = _skipped.sub('', html)
+    head = _head.search(html)
+    head = head.group(1) if head else ''
+    found = [(url, True) for url in _stylesheet.findall(html)]
+    for before, url, after in _script.findall(html):
+        deferred = 'defer' in before + after or 'async' in before + after
+        found.append((url, not deferred and url in head))
+    return found
+
+
+def cached(response):
+    # whether a browser may reuse response without asking again
+    control = response.cache_control
+    return bool(control.immutable or control.max_age)
+
+
+def text(response):
+    # the html of a possibly compressed response
+    if response.content_encoding == 'br':
+        import brotli
+        return brotli.decompress(response.data).decode('utf-8')
+    if response.content_encoding == 'gzip':
+        return gzip.decompress(response.data).decode('utf-8')
+    return response.get_data(as_text=True)
+
+
+def visit(client, url, cache, args):
+    # load url and its subresources; cache maps subresource urls to their
+    # ETag, or None once they need no revalidation. returns (bytes,
+    # requests, server seconds, first paint ms)
+    began = time.perf_counter()
+    response = client.get(url, headers={'Accept-Encoding': ACCEPT_ENCODING})
+    server = time.perf_counter() - began
+    html = response.data
+    transferred, requests = len(html), 1
+
+    blocking_bytes, blocking_trips = 0, 0
+    for resource, blocking in subresources(text(response)):
+        if resource in cache and cache[resource] is None:
+            continue
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if resource in cache:
+            headers['If-None-Match'] = cache[resource]
+        sub = client.get(resource, headers=headers)
+        transferred += len(sub.data)
+        requests += 1
+        if blocking:
+            blocking_bytes += len(sub.data)
+            blocking_trips = 1
+        if sub.status_code == 200:
+            cache[resource] = None if cached(sub) else sub.headers.get('ETag')
+        sub.close()
+
+    bytes_per_ms = args.bandwidth * 1e6 / 8 / 1000
+    first_paint = (server * 1000 + args.rtt + len(html) / bytes_per_ms
+                   + blocking_trips * args.rtt + blocking_bytes / bytes_per_ms)
+    return transferred, requests, server, first_paint
+
+
+def measure(app, urls, args):
+    # (first visit, repeat visit) totals of (bytes, requests, server, paint)
+    client = app.test_client()
+    for url in urls[:2]:
+        visit(client, url, {}, args)
+    results = []
+    for repeat in (False, True):
+        rows = []
+        for url in urls:
+            cache = {}
+            if repeat:
+                visit(client, url, cache, args)
+            rows.append(visit(client, url, cache, args))
+        results.append(rows)
+    return results
+
+
+def run(args):
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = database
+    os.environ['TASK_BACKEND'] = 'fake'
+    sys.path.insert(0, os.path.dirname(HERE))
+
+    import config
+    from app import create_app
+    from extensions import db
+    from benchmarks.datagen import generate
+
+    settings = {name: getattr(config, name) for name in dir(config) if name.isupper()}
+    variants = [
+        ('before', dict(settings, ASSETS_AUTO_BUILD=False, COMPRESS_MIN_SIZE=0,
+                        ASSETS_DIR=tempfile.mkdtemp())),
+        ('after', dict(settings, ASSETS_DIR=tempfile.mkdtemp())),
+    ]
+
+    with create_app(SimpleNamespace(**settings)).app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        venue_ids, _ = generate(args.venues, args.artists, args.shows, seed=args.seed)
+
+    rng = random.Random(args.seed)
+    urls = ['/venues'] + ['/venues/{}'.format(venue_id)
+                          for venue_id in rng.sample(venue_ids, min(args.pages, len(venue_ids)))]
+
+    print('{} venue pages, {}ms rtt, {} Mbit/s'.format(len(urls), args.rtt, args.bandwidth))
+    print('{:<8}{:<8}{:>12}{:>10}{:>12}{:>14}'.format(
+        'assets', 'visit', 'KB/page', 'requests', 'server ms', 'first paint'))
+    for name, overrides in variants:
+        app = create_app(SimpleNamespace(**overrides))
+        for visit_name, rows in zip(('first', 'repeat'), measure(app, urls, args)):
+            print('{:<8}{:<8}{:>12.1f}{:>10.1f}{:>12.2f}{:>12.0f}ms'.format(
+                name, visit_name,
+                statistics.mean(row[0] for row in rows) / 1024,
+                statistics.mean(row[1] for row in rows),
+                statistics.median(row[2] for row in rows) * 1000,
+                statistics.median(row[3] for row in rows)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(run(parse_args()))
@@ -0,0 +1,139 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+#----------------------------------------------------------------------------#
+# Read-through cache.
+#----------------------------------------------------------------------------#
+
+# a backend stores already-assembled values under string keys. the cache
+# in front of it counts hits and misses so the size and TTL can be tuned
+# from /internal/cache.
+
+
+class MemoryBackend(object):
+    # in-process LRU with per-entry expiry. each worker process holds its
+    # own copy, so invalidation only reaches the worker that handled the
+    # write; use the redis backend when running several workers.
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend(object):
+    # stores pickled values in anything that speaks the redis-py get / set
+    # (with ex=) / delete interface. eviction is left to the server's
+    # maxmemory-policy, e.g. allkeys-lru.
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class Cache(object):
+    def __init__(self, backend=None, ttl=300):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.ttl = config.get('CACHE_TTL', 300)
+
+        backend = config.get('CACHE_BACKEND', 'memory')
+        if backend == 'memory':
+            self.backend = MemoryBackend(config.get('CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            import redis
+            self.backend = RedisBackend(redis.Redis.from_url(config['CACHE_REDIS_URL']))
+        else:
+            raise ValueError('unknown CACHE_BACKEND {!r}'.format(backend))
+
+        app.extensions['cache'] = self
+
+    def get_or_set(self, key, create):
+        # return the cached value for key, or call create() and cache its
+        # result. None results (e.g. a missing row) are never cached.
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if value is None:
+            value = create()
+            if value is not None:
+                self.backend.set(key, value, self.ttl)
+        return value
+
+    def invalidate(self, *keys):
+        self.backend.delete(*keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            'backend': type(self.backend).__name__,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats['entries'] = len(self.backend)
+            stats['max_entries'] = self.backend.max_entries
+        return stats
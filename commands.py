@@ -0,0 +1,270 @@
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import tuple_
+
+import counters
+from extensions import db, assets
+from importer import KINDS, read_rows, import_rows
+import exporter
+import feed
+import geo
+from models import Venue, Artist, Show
+from queries import venue_listing_query, filter_listing, shows_query, with_relationships
+
+#----------------------------------------------------------------------------#
+# Query plan checks.
+#----------------------------------------------------------------------------#
+
+
+def _plan_indexes(plan):
+    # every index named anywhere in an EXPLAIN (FORMAT JSON) plan tree
+    indexes = set()
+    if 'Index Name' in plan:
+        indexes.add(plan['Index Name'])
+    for child in plan.get('Plans', []):
+        indexes |= _plan_indexes(child)
+    return indexes
+
+
+def explain(query, natural=False):
+    # return the set of indexes the planner picks for query. unless natural
+    # is set, sequential scans are disabled for the transaction so the
+    # check is meaningful on a small development database.
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if not natural:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + compiled.string, compiled.params)
+        plan = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        db.session.rollback()
+    return _plan_indexes(plan[0]['Plan'])
+
+
+def plan_checks():
+    # (view, query, index the query is expected to use) for each hot query
+    now = datetime.utcnow()
+    limit = current_app.config['PAGE_SIZE']
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar() or 1
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar() or 1
+
+    return [
+        ('venues', venue_listing_query().order_by(
+            Venue.name, Venue.id).limit(limit),
+         'ix_venue_name_id'),
+        ('venues?genre', filter_listing(venue_listing_query(), Venue, {'genre': 'Jazz'}),
+         'ix_venue_genre_genre_id'),
+        ('show_venue', shows_query(Show.venue_id == venue_id, Show.artist),
+         'ix_show_venue_id_starts_at'),
+        ('show_artist', shows_query(Show.artist_id == artist_id, Show.venue),
+         'ix_show_artist_id_starts_at'),
+        ('shows', with_relationships(Show.query, Show.artist, Show.venue).filter(
+            tuple_(Show.starts_at, Show.id) > tuple_(now, 0)).order_by(
+            Show.starts_at, Show.id).limit(limit),
+         'ix_show_starts_at'),
+        ('venues_near', geo.candidates_query(30.2672, -97.7431, 10),
+         'ix_venue_geohash'),
+        ('shows_feed', feed.feed_query(now=now)[0].order_by(
+            feed.show_feed.c.starts_at, feed.show_feed.c.show_id).limit(limit),
+         'ix_show_feed_starts_at'),
+        ('shows_feed?city', feed.feed_query(city='San Francisco', now=now)[0].order_by(
+            feed.show_feed.c.starts_at, feed.show_feed.c.show_id).limit(limit),
+         'ix_show_feed_city_state'),
+    ]
+
+
+@click.command('explain-check')
+@click.option('--natural', is_flag=True,
+              help='Leave sequential scans enabled; use on production-sized data.')
+@with_appcontext
+def explain_check_command(natural):
+    """Assert that each view's show query is served by its index."""
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('explain-check needs a PostgreSQL database')
+
+    failed = []
+    for view, query, index in plan_checks():
+        used = explain(query, natural=natural)
+        ok = index in used
+        click.echo('{:<4} {:<12} expects {:<30} uses {}'.format(
+            'ok' if ok else 'FAIL', view, index, ', '.join(sorted(used)) or '-'))
+        if not ok:
+            failed.append(view)
+
+    if failed:
+        raise click.ClickException(
+            'planner did not use the expected index for: ' + ', '.join(failed))
+
+
+#----------------------------------------------------------------------------#
+# Schema.
+#----------------------------------------------------------------------------#
+
+
+@click.command('init-db')
+@click.option('--drop', is_flag=True, help='Drop every table first.')
+@with_appcontext
+def init_db_command(drop):
+    """Create the tables on a scratch database; use `flask db upgrade` otherwise."""
+    if drop:
+        db.drop_all()
+    db.create_all()
+    click.echo('created the tables')
+
+
+#----------------------------------------------------------------------------#
+# Static assets.
+#----------------------------------------------------------------------------#
+
+
+@click.command('assets-build')
+@with_appcontext
+def assets_build_command():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    bundles = assets.build()
+    for name, sizes in sorted(assets.stats()['bundles'].items()):
+        click.echo('{} -> {} ({})'.format(name, bundles[name], ', '.join(
+            '{} {}'.format(encoding, size) for encoding, size in sizes['bytes'].items())))
+
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+
+@click.command('rollover-shows')
+@with_appcontext
+def rollover_shows_command():
+    """Move shows that have started from upcoming to past in the counters."""
+    recounted = counters.rollover()
+    db.session.commit()
+    click.echo('recounted {} venues and artists'.format(recounted))
+
+
+@click.command('recount-shows')
+@with_appcontext
+def recount_shows_command():
+    """Rebuild every venue's and artist's show counters from scratch."""
+    now = datetime.utcnow()
+    venues = counters.recount(Venue, now=now)
+    artists = counters.recount(Artist, now=now)
+    db.session.commit()
+    click.echo('recounted {} venues and {} artists'.format(venues, artists))
+
+
+@click.command('refresh-feed')
+@click.option('--blocking', is_flag=True,
+              help='Refresh without CONCURRENTLY; faster, but blocks readers.')
+@with_appcontext
+def refresh_feed_command(blocking):
+    """Rebuild the show_feed materialized view behind /shows."""
+    if not feed.uses_view():
+        raise click.ClickException('the show feed is not a materialized view here')
+    elapsed = feed.refresh(concurrently=not blocking)
+    click.echo('refreshed show_feed in {:.1f}ms'.format(elapsed))
+
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='File format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=1000, show_default=True,
+              help='Rows validated and inserted per transaction.')
+@click.option('--copy', 'use_copy', is_flag=True,
+              help='Load valid rows with PostgreSQL COPY instead of INSERT.')
+@click.option('--geocode', 'lookup', type=click.File('r', encoding='utf-8'),
+              help='Geocode venues without coordinates from this lookup CSV.')
+@with_appcontext
+def import_command(kind, path, format, chunk_size, use_copy, lookup):
+    """Import venues, artists or shows from a CSV or JSONL file."""
+    if format is None:
+        format = 'csv' if path.name.endswith('.csv') else 'jsonl'
+    if use_copy and db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('--copy needs a PostgreSQL database')
+
+    def report(line_num, errors):
+        for field, messages in sorted(errors.items()):
+            click.echo('line {}: {}: {}'.format(
+                line_num, field, ' '.join(messages)), err=True)
+
+    imported, failed = import_rows(
+        kind, read_rows(path, format), chunk_size=chunk_size,
+        use_copy=use_copy, on_error=report,
+        lookup=geo.Lookup(lookup) if lookup else None)
+    click.echo('imported {} {}, rejected {}'.format(imported, kind, failed))
+
+
+#----------------------------------------------------------------------------#
+# Geocoding.
+#----------------------------------------------------------------------------#
+
+
+@click.command('geocode')
+@click.option('--lookup', type=click.File('r', encoding='utf-8'), required=True,
+              help='CSV of address, city, state, latitude, longitude; '
+                   'rows without an address cover the whole city.')
+@click.option('--overwrite', is_flag=True,
+              help='Geocode venues that already have coordinates too.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Venues updated per statement.')
+@with_appcontext
+def geocode_command(lookup, overwrite, batch_size):
+    """Fill in venue coordinates from an offline lookup file."""
+    geocoded, missing = geo.geocode_venues(
+        geo.Lookup(lookup), overwrite=overwrite, batch_size=batch_size)
+    db.session.commit()
+    click.echo('geocoded {} venues, {} not found in the lookup'.format(geocoded, missing))
+
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+
+@click.command('export')
+@click.argument('kind', type=click.Choice(sorted(exporter.EXPORT_COLUMNS)))
+@click.option('--format', 'format', type=click.Choice(sorted(exporter.FORMATS)),
+              default='csv', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip the output.')
+@click.option('-o', '--output', type=click.File('wb'), default='-',
+              help='Output file; defaults to stdout.')
+@click.option('--city')
+@click.option('--state')
+@click.option('--start', type=click.DateTime(), help='Shows starting at or after; shows only.')
+@click.option('--end', type=click.DateTime(), help='Shows starting before; shows only.')
+@click.option('--batch-size', default=1000, show_default=True,
+              help='Rows fetched from the server-side cursor at a time.')
+@with_appcontext
+def export_command(kind, format, compress, output, city, state, start, end, batch_size):
+    """Stream venues, artists or shows out as CSV or NDJSON."""
+    try:
+        chunks = exporter.export(kind, format, compress=compress,
+                                 batch_size=batch_size, city=city, state=state,
+                                 start=start, end=end)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+    for chunk in chunks:
+        output.write(chunk if compress else chunk.encode('utf-8'))
+
+
+def init_app(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(assets_build_command)
+    app.cli.add_command(explain_check_command)
+    app.cli.add_command(rollover_shows_command)
+    app.cli.add_command(recount_shows_command)
+    app.cli.add_command(refresh_feed_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(geocode_command)
+    app.cli.add_command(export_command)
@@ -1,10 +1,77 @@
 import os
-SECRET_KEY = os.urandom(32)
+# Sessions and CSRF tokens are signed with SECRET_KEY, so every worker has
+# to share it: set it in the environment (wsgi.py refuses to start without
+# it). A development server without one makes up its own.
+SECRET_KEY = os.getenv('SECRET_KEY') or os.urandom(32)
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
+# Enable debug mode with DEBUG=true; never in production.
+DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
+
+# Outside debug mode errors are also written to this file when it is set.
+ERROR_LOG = os.getenv('ERROR_LOG')
+
+# Listing pages are keyset paginated; clients may ask for smaller or larger
+# pages with ?limit=, capped at MAX_PAGE_SIZE.
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 200))
+
+# Maximum number of venues or artists returned by a search.
+SEARCH_LIMIT = int(os.getenv('SEARCH_LIMIT', 20))
+
+# Detail page cache. CACHE_BACKEND is 'memory' (per process LRU) or
+# 'redis' (shared between workers, needs CACHE_REDIS_URL).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_TTL = int(os.getenv('CACHE_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Background jobs for the side effects of writes. TASK_BACKEND is 'thread'
+# (a pool of TASK_WORKERS threads per process) or 'fake' (jobs wait until
+# run explicitly; for tests and benchmarks). Failed jobs are retried
+# TASK_MAX_RETRIES times, TASK_RETRY_DELAY seconds apart, doubling.
+TASK_BACKEND = os.getenv('TASK_BACKEND', 'thread')
+TASK_WORKERS = int(os.getenv('TASK_WORKERS', 4))
+TASK_MAX_RETRIES = int(os.getenv('TASK_MAX_RETRIES', 3))
+TASK_RETRY_DELAY = float(os.getenv('TASK_RETRY_DELAY', 0.5))
+TASK_RETENTION = int(os.getenv('TASK_RETENTION', 10000))
+
+# /internal/* (cache, pool, task and feed metrics) and /jobs/<id> answer
+# only requests sent with 'Authorization: Bearer <INTERNAL_TOKEN>'. Without
+# a token they are served in debug mode only.
+INTERNAL_TOKEN = os.getenv('INTERNAL_TOKEN')
+
+# Rendered template fragments ({% cache %} blocks) are kept in a per
+# process LRU of FRAGMENT_CACHE_MAX_ENTRIES entries.
+FRAGMENT_CACHE_ENABLED = os.getenv('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+
+# Stylesheets and scripts are served as fingerprinted, precompressed
+# bundles (see assets.py), built into ASSETS_DIR (static/dist) by
+# `flask assets-build`, or on first use when ASSETS_AUTO_BUILD is on.
+# Browsers keep them for ASSETS_MAX_AGE seconds without revalidating.
+ASSETS_DIR = os.getenv('ASSETS_DIR')
+ASSETS_AUTO_BUILD = os.getenv('ASSETS_AUTO_BUILD', 'true').lower() == 'true'
+ASSETS_MAX_AGE = int(os.getenv('ASSETS_MAX_AGE', 31536000))
+# HTML responses of at least this many bytes are gzip or brotli compressed
+# for clients that accept it; 0 turns it off, e.g. behind a proxy that
+# compresses already.
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+
+# /shows lists upcoming shows from the show_feed materialized view on
+# PostgreSQL ('view') or joins the base tables per request ('live').
+# SHOW_FEED_REFRESH 'write' refreshes the view in the background after
+# every write to a show, venue or artist; with 'manual' it is left to
+# `flask refresh-feed` in cron, which also drops the shows that started.
+SHOW_FEED = os.getenv('SHOW_FEED', 'view')
+SHOW_FEED_REFRESH = os.getenv('SHOW_FEED_REFRESH', 'write')
+
+# Per-request SQL profiling: Server-Timing headers plus a JSON log of
+# slow and duplicated statements. Off by default, and free when off.
+SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG')
 
 # Connect to the database
 
@@ -14,5 +81,46 @@ DB_USER = os.getenv('DB_USER', 'simbarashe')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'atoncemedia2022')
 DB_NAME = os.getenv('DB_NAME', 'fyyur')
 
-SQLALCHEMY_DATABASE_URI = 'postgresql+psycopg2://{}:{}@{}/{}'.format(
-    DB_USER, DB_PASSWORD, DB_HOST, DB_NAME)
+SQLALCHEMY_DATABASE_URI = os.getenv(
+    'DATABASE_URL', 'postgresql+psycopg2://{}:{}@{}/{}'.format(
+        DB_USER, DB_PASSWORD, DB_HOST, DB_NAME))
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, per worker process. Each gunicorn worker holds up to
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections; size them against the
+# server's max_connections. Live numbers are served at /internal/pool.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+# seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+# seconds after which a connection is replaced, to stay under server or
+# load balancer idle timeouts
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# milliseconds; 0 leaves the server default (no timeout)
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+
+# Listing and detail pages read through an async engine when ASYNC_READS
+# is on, the detail pages issuing their queries concurrently on separate
+# connections (see aio.py). It keeps a pool of its own,
+# ASYNC_POOL_SIZE + ASYNC_MAX_OVERFLOW connections per worker on top of
+# the sync pool. Needs greenlet and asyncpg (aiosqlite for a sqlite
+# DATABASE_URL).
+ASYNC_READS = os.getenv('ASYNC_READS', 'false').lower() == 'true'
+ASYNC_POOL_SIZE = int(os.getenv('ASYNC_POOL_SIZE', 10))
+ASYNC_MAX_OVERFLOW = int(os.getenv('ASYNC_MAX_OVERFLOW', 20))
+
+# pool options only apply to the postgres server; a sqlite DATABASE_URL
+# (used by the benchmarks) keeps sqlalchemy's defaults
+SQLALCHEMY_ENGINE_OPTIONS = {}
+if SQLALCHEMY_DATABASE_URI.startswith('postgresql'):
+    SQLALCHEMY_ENGINE_OPTIONS.update({
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    })
+    if DB_STATEMENT_TIMEOUT:
+        SQLALCHEMY_ENGINE_OPTIONS['connect_args'] = {
+            'options': '-c statement_timeout={}'.format(DB_STATEMENT_TIMEOUT)}
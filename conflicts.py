@@ -0,0 +1,196 @@
+import random
+
+from extensions import db
+from models import Show
+
+#----------------------------------------------------------------------------#
+# Booking conflicts.
+#----------------------------------------------------------------------------#
+
+# a venue cannot host, and an artist cannot play, two shows whose
+# [start_time, end_time) ranges overlap. on PostgreSQL an exclusion
+# constraint per owner enforces this (see models.py); the checks here run
+# first so a rejected show gets a readable reason instead of a constraint
+# violation. a single show is checked with one query; batch imports keep
+# an in-memory interval index per venue and artist for each chunk instead,
+# so checking n shows costs O(n log n) rather than n queries.
+
+OWNERS = (('venue', 'venue_id'), ('artist', 'artist_id'))
+
+# venues or artists whose bookings are loaded per query
+LOAD_BATCH = 200
+
+
+def _format_range(start, end):
+    if start.date() == end.date():
+        return '{:%Y-%m-%d %H:%M}-{:%H:%M}'.format(start, end)
+    return '{:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}'.format(start, end)
+
+
+def describe(owner, owner_id, start, end, label):
+    # the reason a show clashes with the booking labelled label
+    verb = 'is already booked' if owner == 'venue' else 'is already playing'
+    return '{} {} {} {} ({}).'.format(
+        owner.capitalize(), owner_id, verb, _format_range(start, end), label)
+
+
+def find_conflicts(venue_id, artist_id, start, end, exclude_id=None):
+    # reasons the proposed show clashes with existing ones, empty if none.
+    # each side is a range scan of its (owner id, start_time) index.
+    query = db.session.query(
+        Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.end_time
+    ).filter(
+        db.or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+        Show.start_time < end,
+        Show.end_time > start
+    ).order_by(Show.start_time, Show.id)
+    if exclude_id is not None:
+        query = query.filter(Show.id != exclude_id)
+
+    reasons = []
+    for show in query:
+        label = 'show {}'.format(show.id)
+        if show.venue_id == venue_id:
+            reasons.append(describe('venue', venue_id, show.start_time, show.end_time, label))
+        if show.artist_id == artist_id:
+            reasons.append(describe('artist', artist_id, show.start_time, show.end_time, label))
+    return reasons
+
+
+class _Booking(object):
+    __slots__ = ('start', 'end', 'label', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, start, end, label):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.priority = random.random()
+        self.left = self.right = None
+        self.max_end = end
+
+
+def _update(node):
+    node.max_end = max(node.end,
+                       node.left.max_end if node.left else node.end,
+                       node.right.max_end if node.right else node.end)
+
+
+def _rotate_right(node):
+    top = node.left
+    node.left = top.right
+    _update(node)
+    top.right = node
+    _update(top)
+    return top
+
+
+def _rotate_left(node):
+    top = node.right
+    node.right = top.left
+    _update(node)
+    top.left = node
+    _update(top)
+    return top
+
+
+def _insert(node, new):
+    if node is None:
+        return new
+    if new.start < node.start:
+        node.left = _insert(node.left, new)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, new)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    _update(node)
+    return node
+
+
+class IntervalIndex(object):
+    # the bookings of one venue or artist: a treap ordered by start, each
+    # node also holding the latest end in its subtree. a lookup skips every
+    # subtree that ends before start or begins after end, so adding and
+    # finding cost O(log n) (plus the matches) in expectation, however long
+    # or overlapping the bookings are.
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, start, end, label):
+        self.root = _insert(self.root, _Booking(start, end, label))
+        self.size += 1
+
+    def overlapping(self, start, end):
+        # (start, end, label) of every booking overlapping [start, end), by start
+        found = []
+        stack, node = [], self.root
+        while stack or node is not None:
+            if node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+                continue
+            if not stack:
+                break
+            node = stack.pop()
+            if node.start >= end:
+                break
+            if node.end > start:
+                found.append((node.start, node.end, node.label))
+            node = node.right
+        return found
+
+
+class BookingChecker(object):
+    # checks a stream of proposed shows against the database and against
+    # each other, one chunk at a time. for each venue and artist in the
+    # chunk only the existing shows overlapping the span of its rows are
+    # loaded, in one query per owner type; accepted rows join the index so
+    # later rows of the chunk are checked against them. the indexes are
+    # dropped by the next load, by which time the accepted rows are
+    # committed, so memory follows the chunk and not the booking history.
+    def __init__(self):
+        self.indexes = {}
+
+    def load(self, shows):
+        # index the bookings that may clash with shows (dicts with
+        # venue_id, artist_id, start_time and end_time), replacing the
+        # previous chunk's
+        self.indexes = {}
+        for owner, column in OWNERS:
+            spans = {}
+            for show in shows:
+                start, end = spans.get(show[column], (show['start_time'], show['end_time']))
+                spans[show[column]] = (min(start, show['start_time']),
+                                       max(end, show['end_time']))
+            for owner_id in spans:
+                self.indexes[(owner, owner_id)] = IntervalIndex()
+            if not spans:
+                continue
+            foreign_key = getattr(Show, column)
+            spans = list(spans.items())
+            # batched, so the OR stays within sqlite's expression depth limit
+            for offset in range(0, len(spans), LOAD_BATCH):
+                rows = db.session.query(
+                    foreign_key, Show.id, Show.start_time, Show.end_time
+                ).filter(db.or_(*[
+                    db.and_(foreign_key == owner_id, Show.start_time < end, Show.end_time > start)
+                    for owner_id, (start, end) in spans[offset:offset + LOAD_BATCH]]))
+                for owner_id, show_id, start, end in rows:
+                    self.indexes[(owner, owner_id)].add(
+                        start, end, 'show {}'.format(show_id))
+
+    def check(self, show, label):
+        # reasons show clashes with a known booking; a show without
+        # conflicts is added to the index under label
+        reasons = []
+        for owner, column in OWNERS:
+            index = self.indexes[(owner, show[column])]
+            for start, end, other in index.overlapping(show['start_time'], show['end_time']):
+                reasons.append(describe(owner, show[column], start, end, other))
+        if not reasons:
+            for owner, column in OWNERS:
+                self.indexes[(owner, show[column])].add(
+                    show['start_time'], show['end_time'], label)
+        return reasons
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from extensions import db
+from models import Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Denormalized show counters.
+#----------------------------------------------------------------------------#
+
+# every venue and artist row carries upcoming_shows_count, past_shows_count
+# and next_show_at, so listings read them without touching show. a new
+# show bumps its venue's and artist's counters in the same flush. deleting
+# or moving a show recounts its owners from their show index. counters are
+# only as current as the last rollover: rollover() recounts the rows whose
+# next show has started since, found through the next_show_at index. run
+# it periodically with `flask rollover-shows`. shows are split by their
+# UTC start, Show.starts_at, so next_show_at is in UTC too.
+
+OWNERS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+
+def _count_values(model, foreign_key, now):
+    # correlated subqueries recomputing a row's counters from show, each
+    # answered by the (owner id, starts_at) index
+    def over_shows(column, criterion):
+        return db.select(column).where(
+            foreign_key == model.id, criterion).scalar_subquery()
+
+    return {
+        'upcoming_shows_count': over_shows(db.func.count(), Show.starts_at > now),
+        'past_shows_count': over_shows(db.func.count(), Show.starts_at <= now),
+        'next_show_at': over_shows(db.func.min(Show.starts_at), Show.starts_at > now),
+    }
+
+
+def recount(model, ids=None, now=None, connection=None):
+    # recompute the counters of the given rows, or every row, from show;
+    # returns the number of rows updated
+    now = now or datetime.utcnow()
+    foreign_key = dict(OWNERS)[model]
+    statement = model.__table__.update().values(
+        **_count_values(model, foreign_key, now))
+    if ids is not None:
+        ids = set(ids)
+        if not ids:
+            return 0
+        statement = statement.where(model.id.in_(ids))
+    return (connection or db.session).execute(statement).rowcount
+
+
+def recount_shows(shows, now=None, connection=None):
+    # recount the venues and artists of (venue_id, artist_id) pairs, e.g.
+    # after a bulk insert that bypassed the ORM
+    shows = list(shows)
+    recount(Venue, [venue_id for venue_id, _ in shows], now, connection)
+    recount(Artist, [artist_id for _, artist_id in shows], now, connection)
+
+
+def rollover(now=None, connection=None):
+    # move shows that have started since the last rollover from upcoming to
+    # past; returns the number of venue and artist rows recounted
+    now = now or datetime.utcnow()
+    recounted = 0
+    for model, foreign_key in OWNERS:
+        # updated_at moves too, since the listings' versions are read from it
+        statement = model.__table__.update().values(
+            updated_at=now, **_count_values(model, foreign_key, now)).where(
+                model.next_show_at <= now)
+        recounted += (connection or db.session).execute(statement).rowcount
+    return recounted
+
+
+def _record_show(connection, show, now):
+    if show.starts_at is None:
+        return
+    for model, owner_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        if show.starts_at > now:
+            values = {
+                'upcoming_shows_count': model.upcoming_shows_count + 1,
+                'next_show_at': db.case(
+                    (db.or_(model.next_show_at.is_(None),
+                            model.next_show_at > show.starts_at), show.starts_at),
+                    else_=model.next_show_at),
+            }
+        else:
+            values = {'past_shows_count': model.past_shows_count + 1}
+        connection.execute(model.__table__.update().values(**values).where(
+            model.id == owner_id))
+
+
+@event.listens_for(Show, 'after_insert')
+def _show_inserted(mapper, connection, show):
+    _record_show(connection, show, datetime.utcnow())
+
+
+@event.listens_for(Show, 'after_delete')
+def _show_deleted(mapper, connection, show):
+    recount_shows([(show.venue_id, show.artist_id)], connection=connection)
+
+
+@event.listens_for(Show, 'after_update')
+def _show_updated(mapper, connection, show):
+    # recount both the old and the new owners when a show is moved
+    state = db.inspect(show)
+    changed = False
+    venue_ids = {show.venue_id}
+    artist_ids = {show.artist_id}
+    for attribute, ids in (('venue_id', venue_ids), ('artist_id', artist_ids),
+                           ('start_time', None)):
+        history = state.attrs[attribute].history
+        if history.has_changes():
+            changed = True
+            if ids is not None:
+                ids.update(value for value in history.deleted if value is not None)
+    if changed:
+        now = datetime.utcnow()
+        recount(Venue, venue_ids, now, connection)
+        recount(Artist, artist_ids, now, connection)
+
+
+@event.listens_for(Venue, 'after_update')
+def _venue_updated(mapper, connection, venue):
+    # a new timezone moves the venue's shows in UTC (see models.py), which
+    # may move them between past and upcoming
+    if db.inspect(venue).attrs.timezone.history.has_changes():
+        artist_ids = connection.execute(db.select(Show.artist_id).where(
+            Show.venue_id == venue.id).distinct()).scalars().all()
+        now = datetime.utcnow()
+        recount(Venue, [venue.id], now, connection)
+        recount(Artist, artist_ids, now, connection)
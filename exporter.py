@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+from extensions import db
+from models import Venue, Artist, Show, Genre
+
+#----------------------------------------------------------------------------#
+# Streaming export of venues, artists and shows.
+#----------------------------------------------------------------------------#
+
+# rows are read through a server-side cursor in batches and serialized as
+# they arrive, so an export holds one batch in memory no matter how large
+# the table is, and the first bytes go out as soon as the first batch is
+# fetched.
+
+
+def genre_names(model):
+    # comma separated genre names of the outer venue or artist row, in the
+    # form the importer reads back
+    link = model.genre_objects.property.secondary
+    owner_id = link.c['{}_id'.format(model.__tablename__)]
+    return db.select(db.func.aggregate_strings(Genre.name, ',')).select_from(
+        link.join(Genre, Genre.id == link.c.genre_id)).where(
+        owner_id == model.id).scalar_subquery().label('genres')
+
+
+EXPORT_COLUMNS = {
+    'venues': [Venue.id, Venue.name, Venue.city, Venue.state, Venue.address,
+               Venue.phone, genre_names(Venue), Venue.image_link, Venue.facebook_link,
+               Venue.website, Venue.seeking_talent, Venue.seeking_description],
+    'artists': [Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+                genre_names(Artist), Artist.image_link, Artist.facebook_link,
+                Artist.website, Artist.seeking_venue, Artist.seeking_description],
+    'shows': [Show.id, Show.artist_id, Show.venue_id, Show.start_time, Show.end_time],
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def export_query(kind, city=None, state=None, start=None, end=None):
+    # select the export columns for kind, filtered by area (for shows, the
+    # venue's area) and by show start time. raises ValueError for a start
+    # or end on venues or artists, which have no start time.
+    if (start or end) and kind != 'shows':
+        raise ValueError('start and end only apply to shows')
+    columns = EXPORT_COLUMNS[kind]
+    query = db.session.query(*columns)
+    area = Venue if kind in ('venues', 'shows') else Artist
+
+    if kind == 'shows':
+        if city or state:
+            query = query.join(Venue, Show.venue_id == Venue.id)
+        if start:
+            query = query.filter(Show.start_time >= start)
+        if end:
+            query = query.filter(Show.start_time < end)
+    if city:
+        query = query.filter(area.city == city)
+    if state:
+        query = query.filter(area.state == state)
+
+    return query.order_by(columns[0]).statement
+
+
+def iter_batches(query, batch_size=1000):
+    # yield lists of rows fetched through a server-side cursor
+    connection = db.engine.connect().execution_options(stream_results=True)
+    try:
+        result = connection.execute(query)
+        while True:
+            rows = result.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    finally:
+        connection.close()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def to_csv(kind, batches):
+    names = [column.key for column in EXPORT_COLUMNS[kind]]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for rows in batches:
+        for row in rows:
+            writer.writerow([_csv_value(value) for value in row])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def to_ndjson(kind, batches):
+    names = [column.key for column in EXPORT_COLUMNS[kind]]
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(names, row)), default=_json_default) + '\n'
+            for row in rows)
+
+
+def gzipped(chunks):
+    # gzip a stream of text chunks without buffering the whole output
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(kind, format='csv', compress=False, batch_size=1000, **filters):
+    # the export as a generator of str chunks, or of gzip bytes if compress
+    batches = iter_batches(export_query(kind, **filters), batch_size)
+    chunks = to_csv(kind, batches) if format == 'csv' else to_ndjson(kind, batches)
+    if compress:
+        return gzipped(chunks)
+    return chunks
@@ -1,3 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from aio import AsyncReads
+from assets import Assets
+from cache import Cache
+from fragments import FragmentCache
+from tasks import TaskQueue
+
 db = SQLAlchemy()
+assets = Assets()
+cache = Cache()
+fragments = FragmentCache()
+queue = TaskQueue()
+reads = AsyncReads()
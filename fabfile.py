@@ -5,11 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # latency against the baseline, then the per-page query counts
     with settings(warn_only=True):
-        result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
-        )
-    if result.failed and not confirm("Tests failed. Continue?"):
+        results = [local("python -m benchmarks.run --check", capture=True),
+                   local("python -m benchmarks.querycount", capture=True)]
+    if any(result.failed for result in results) and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
 
 
@@ -0,0 +1,252 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import DDL, event
+
+from extensions import db, queue
+from models import Venue, Artist, Show
+from tasks import QUEUED
+
+#----------------------------------------------------------------------------#
+# Materialized show feed.
+#----------------------------------------------------------------------------#
+
+# /shows reads the upcoming shows joined to their venue and artist from a
+# denormalized copy, kept on PostgreSQL as the show_feed materialized view.
+# the view is refreshed CONCURRENTLY, so readers are never blocked: after
+# any commit that touched a show, venue or artist (SHOW_FEED_REFRESH =
+# 'write'), or from cron with `flask refresh-feed` ('manual'). writes made
+# while a refresh job is still queued share that job. a refresh only
+# rewrites the rows that changed; when it ran is kept apart, in the
+# one-row show_feed_refresh table. shows that started since the last
+# refresh are filtered out when reading. on other databases, or with
+# SHOW_FEED = 'live', the same columns come from the live join instead.
+# every time here is UTC, compared with datetime.utcnow().
+
+logger = logging.getLogger('fyyur.feed')
+
+# the view's columns; it lives outside db.metadata so create_all and
+# migrate autogenerate leave it alone
+feed_metadata = db.MetaData()
+show_feed = db.Table(
+    'show_feed', feed_metadata,
+    db.Column('show_id', db.Integer, primary_key=True),
+    db.Column('start_time', db.DateTime),
+    db.Column('end_time', db.DateTime),
+    db.Column('starts_at', db.DateTime),
+    db.Column('venue_id', db.Integer),
+    db.Column('venue_name', db.String),
+    db.Column('venue_city', db.String(120)),
+    db.Column('venue_state', db.String(120)),
+    db.Column('venue_timezone', db.String(64)),
+    db.Column('venue_image_link', db.String(500)),
+    db.Column('artist_id', db.Integer),
+    db.Column('artist_name', db.String),
+    db.Column('artist_image_link', db.String(500)),
+)
+show_feed_refresh = db.Table(
+    'show_feed_refresh', feed_metadata,
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('refreshed_at', db.DateTime),
+)
+
+FEED_COLUMNS = [
+    Show.id.label('show_id'), Show.start_time, Show.end_time, Show.starts_at,
+    Venue.id.label('venue_id'), Venue.name.label('venue_name'),
+    Venue.city.label('venue_city'), Venue.state.label('venue_state'),
+    Venue.timezone.label('venue_timezone'), Venue.image_link.label('venue_image_link'),
+    Artist.id.label('artist_id'), Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'),
+]
+
+
+def live_feed():
+    # the feed computed from the base tables, with the view's columns
+    return db.select(*FEED_COLUMNS).join_from(
+        Show, Venue, Venue.id == Show.venue_id).join(
+        Artist, Artist.id == Show.artist_id).subquery('show_feed')
+
+
+def uses_view():
+    return current_app.config.get('SHOW_FEED', 'view') == 'view' and \
+        db.engine.dialect.name == 'postgresql'
+
+
+def feed_source():
+    # show_feed or its live equivalent; both have the same columns
+    return show_feed if uses_view() else live_feed()
+
+
+def feed_query(city=None, state=None, now=None):
+    # the shows still to start, optionally for one city or state, to be
+    # paged by (starts_at, show_id)
+    now = now or datetime.utcnow()
+    source = feed_source()
+    query = db.session.query(source).filter(source.c.starts_at >= now)
+    if city:
+        query = query.filter(source.c.venue_city == city)
+    if state:
+        query = query.filter(source.c.venue_state == state)
+    return query, (source.c.starts_at, source.c.show_id)
+
+
+#----------------------------------------------------------------------------#
+# Refreshing.
+#----------------------------------------------------------------------------#
+
+class RefreshStats(object):
+    # refresh durations in this process, plus how long writes have waited
+    # for a refresh to pick them up
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_ms = None
+        self.max_ms = 0.0
+        self.total_ms = 0.0
+        self.dirty_since = None
+        self.pending = None
+
+    def to_dict(self, now=None):
+        now = now or datetime.utcnow()
+        with self.lock:
+            return {
+                'refreshes': self.refreshes,
+                'failures': self.failures,
+                'last_refresh_ms': self.last_ms,
+                'max_refresh_ms': round(self.max_ms, 3),
+                'avg_refresh_ms': round(self.total_ms / self.refreshes, 3)
+                if self.refreshes else None,
+                'lag_seconds': round((now - self.dirty_since).total_seconds(), 3)
+                if self.dirty_since else 0.0,
+            }
+
+
+refresh_stats = RefreshStats()
+
+
+def refresh(concurrently=True):
+    # rebuild show_feed; returns the time taken in ms
+    with refresh_stats.lock:
+        refresh_stats.dirty_since = None
+    started = time.perf_counter()
+    try:
+        db.session.execute(db.text('REFRESH MATERIALIZED VIEW {}show_feed'.format(
+            'CONCURRENTLY ' if concurrently else '')))
+        db.session.execute(show_feed_refresh.update().values(refreshed_at=datetime.utcnow()))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        with refresh_stats.lock:
+            refresh_stats.failures += 1
+        raise
+    elapsed = (time.perf_counter() - started) * 1000
+
+    with refresh_stats.lock:
+        refresh_stats.refreshes += 1
+        refresh_stats.last_ms = round(elapsed, 3)
+        refresh_stats.max_ms = max(refresh_stats.max_ms, elapsed)
+        refresh_stats.total_ms += elapsed
+    logger.info('refreshed show_feed in %.1fms', elapsed)
+    return elapsed
+
+
+@queue.task
+def refresh_feed():
+    refresh()
+
+
+def request_refresh():
+    # queue a refresh unless one is already waiting to start
+    if not uses_view():
+        return None
+    with refresh_stats.lock:
+        if refresh_stats.dirty_since is None:
+            refresh_stats.dirty_since = datetime.utcnow()
+        pending = refresh_stats.pending
+        if pending is not None and pending.status == QUEUED:
+            return pending
+        refresh_stats.pending = job = queue.enqueue(refresh_feed)
+    return job
+
+
+def stats():
+    # refresh metrics, and the age of the data /shows is serving
+    data = refresh_stats.to_dict()
+    data['source'] = 'view' if uses_view() else 'live'
+    data['refresh'] = current_app.config.get('SHOW_FEED_REFRESH', 'write')
+    data['refreshed_at'] = data['age_seconds'] = None
+    if uses_view():
+        # by whichever process refreshed it last
+        refreshed_at = db.session.query(show_feed_refresh.c.refreshed_at).scalar()
+        if refreshed_at is not None:
+            data['refreshed_at'] = refreshed_at
+            data['age_seconds'] = round((datetime.utcnow() - refreshed_at).total_seconds(), 3)
+    return data
+
+
+FEED_MODELS = (Show, Venue, Artist)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _note_feed_changes(session, flush_context, instances):
+    if any(isinstance(instance, FEED_MODELS)
+           for instance in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info['feed_dirty'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _refresh_after_commit(session):
+    if session.info.pop('feed_dirty', False) and \
+            current_app.config.get('SHOW_FEED_REFRESH', 'write') == 'write':
+        request_refresh()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_feed_changes(session):
+    session.info.pop('feed_dirty', None)
+
+
+#----------------------------------------------------------------------------#
+# The view for databases built with db.create_all().
+# Mirrors migrations/versions/d3f7a2c5e814_upcoming_show_feed.py.
+#----------------------------------------------------------------------------#
+
+# the view holds the shows that had not started at the last refresh. its
+# rows carry no refresh time, so a concurrent refresh rewrites only what
+# changed; the unique index on show_id is what allows one.
+
+event.listen(db.metadata, 'after_create', DDL("""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS show_feed AS
+    SELECT show.id AS show_id, show.start_time, show.end_time, show.starts_at,
+           venue.id AS venue_id, venue.name AS venue_name,
+           venue.city AS venue_city, venue.state AS venue_state,
+           venue.timezone AS venue_timezone, venue.image_link AS venue_image_link,
+           artist.id AS artist_id, artist.name AS artist_name,
+           artist.image_link AS artist_image_link
+    FROM show
+    JOIN venue ON venue.id = show.venue_id
+    JOIN artist ON artist.id = show.artist_id
+    WHERE show.starts_at >= now() AT TIME ZONE 'UTC'
+""").execute_if(dialect='postgresql'))
+
+for name, columns, unique in (
+        ('ux_show_feed_show_id', 'show_id', True),
+        ('ix_show_feed_starts_at', 'starts_at, show_id', False),
+        ('ix_show_feed_city_state', 'venue_city, venue_state, starts_at, show_id', False)):
+    event.listen(db.metadata, 'after_create', DDL(
+        'CREATE {}INDEX IF NOT EXISTS {} ON show_feed ({})'.format(
+            'UNIQUE ' if unique else '', name, columns)
+    ).execute_if(dialect='postgresql'))
+
+for statement in (
+        'CREATE TABLE IF NOT EXISTS show_feed_refresh (id integer PRIMARY KEY, refreshed_at timestamp)',
+        "INSERT INTO show_feed_refresh VALUES (1, now() AT TIME ZONE 'UTC') ON CONFLICT (id) DO NOTHING"):
+    event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+for statement in ('DROP MATERIALIZED VIEW IF EXISTS show_feed',
+                  'DROP TABLE IF EXISTS show_feed_refresh'):
+    event.listen(db.metadata, 'before_drop', DDL(statement).execute_if(dialect='postgresql'))
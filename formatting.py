@@ -0,0 +1,154 @@
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timezone as dt_timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#----------------------------------------------------------------------------#
+
+# the Jinja datetime filter. a babel pattern is compiled once per (format,
+# zone shown) into its %-format string and the fields it uses, split by
+# what they depend on: date fields are computed once per day and time
+# fields once per time of day, so a page of thousands of shows spread over
+# a few months formats a few hundred fields in total, and zone names once
+# per zone and offset. whole results are also memoized per (value, format,
+# timezone, locale) for timestamps that repeat across requests. shows are
+# stored as naive times in their venue's local time; given the venue's
+# timezone the value is labelled with it and the zone abbreviation is shown.
+# babel and dateutil are imported on first use, keeping them out of app
+# startup.
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+DEFAULT_LOCALE = 'en'
+
+# pattern letters that depend only on the date, or only on the time of day;
+# the rest (time zones) need the whole value
+DATE_FIELDS = frozenset('GyYuUQqMLlwWdDFgEec')
+TIME_FIELDS = frozenset('aBbhHKkmsSA')
+SECOND_FIELDS = frozenset('sSA')
+
+Compiled = namedtuple('Compiled', 'format date_keys time_keys other_keys seconds')
+
+
+@lru_cache(maxsize=None)
+def _compile(format, with_zone):
+    from babel.dates import parse_pattern
+
+    pattern = FORMATS.get(format, format)
+    pattern = parse_pattern(pattern + ' z' if with_zone else pattern)
+    keys = list(dict.fromkeys(re.findall(r'%\((\w+)\)s', pattern.format)))
+    return Compiled(
+        pattern.format,
+        tuple(key for key in keys if key[0] in DATE_FIELDS),
+        tuple(key for key in keys if key[0] in TIME_FIELDS),
+        tuple(key for key in keys if key[0] not in DATE_FIELDS | TIME_FIELDS),
+        any(key[0] in SECOND_FIELDS for key in keys))
+
+
+@lru_cache(maxsize=None)
+def _locale(name):
+    from babel import Locale
+
+    return Locale.parse(name)
+
+
+@lru_cache(maxsize=None)
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _fields(value, keys, locale):
+    from babel.dates import DateTimeFormat
+
+    formatter = DateTimeFormat(value, _locale(locale))
+    return {key: formatter[key] for key in keys}
+
+
+@lru_cache(maxsize=4096)
+def _date_fields(day, keys, locale):
+    return _fields(datetime.combine(day, time()), keys, locale)
+
+
+@lru_cache(maxsize=4096)
+def _time_fields(moment, keys, locale):
+    return _fields(datetime.combine(date(2000, 1, 1), moment), keys, locale)
+
+
+# zone names depend on the zone and whether daylight saving is in effect,
+# which the offsets capture; keyed without the value itself, so it is a
+# plain dict rather than an lru_cache. there are a few entries per zone.
+_zone_memo = {}
+
+
+def _zone_fields(value, keys, locale):
+    key = (value.tzinfo, value.utcoffset(), value.dst(), keys, locale)
+    fields = _zone_memo.get(key)
+    if fields is None:
+        fields = _zone_memo[key] = _fields(value, keys, locale)
+    return fields
+
+
+def _parse(value):
+    # strings are still accepted from older callers; iso strings take the
+    # fast path
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+
+
+@lru_cache(maxsize=16384)
+def _format(value, format, timezone, locale):
+    zone = _zone(timezone) if timezone else None
+    if zone is not None:
+        value = value.replace(tzinfo=zone) if value.tzinfo is None else value.astimezone(zone)
+    compiled = _compile(format, zone is not None)
+
+    fields = dict(_date_fields(value.date(), compiled.date_keys, locale))
+    moment = value.time() if compiled.seconds else time(value.hour, value.minute)
+    fields.update(_time_fields(moment, compiled.time_keys, locale))
+    if compiled.other_keys:
+        fields.update(_zone_fields(value, compiled.other_keys, locale))
+    return compiled.format % fields
+
+
+def format_datetime(value, format='medium', timezone=None, locale=DEFAULT_LOCALE):
+    # value as text in one of FORMATS or a babel pattern, in the venue's
+    # timezone when one is given
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        value = _parse(value)
+    return _format(value, format, timezone or None, locale)
+
+
+def is_timezone(name):
+    return _zone(name) is not None
+
+
+#----------------------------------------------------------------------------#
+# Venue clocks.
+#----------------------------------------------------------------------------#
+
+# whether a show is past or upcoming depends on the time at its venue, so
+# every show also carries its start as a naive UTC time (Show.starts_at),
+# compared with datetime.utcnow(). times of venues without a timezone are
+# taken to be UTC already.
+
+
+def to_utc(value, timezone=None):
+    # value, a naive local time in timezone, as a naive UTC time
+    zone = _zone(timezone) if timezone else None
+    if value is None or zone is None:
+        return value
+    return value.replace(tzinfo=zone).astimezone(dt_timezone.utc).replace(tzinfo=None)
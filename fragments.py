@@ -0,0 +1,103 @@
+import hashlib
+import threading
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import MemoryBackend
+
+#----------------------------------------------------------------------------#
+# Rendered fragment cache.
+#----------------------------------------------------------------------------#
+
+# templates wrap repeated markup in
+#
+#     {% cache 'show-tile', show.show_id, show.start_time, show.artist_name %}
+#         ...
+#     {% endcache %}
+#
+# and the block is rendered once per distinct key, then served from an
+# in-process LRU. the key is the fragment's name, the entity id and its
+# version: an updated_at where the row has one, otherwise the fields the
+# block renders, so a changed row is simply a new key and nothing has to
+# be invalidated. hits and misses are counted per template and served by
+# /internal/fragments.
+#
+# a lookup hashes the key and takes a lock, which costs about as much as
+# rendering a few lines of static markup. only wrap blocks that do real
+# work, like the show tiles and their babel date formatting.
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        args = [nodes.Const(parser.name), nodes.List(parts)]
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body
+                               ).set_lineno(lineno)
+
+    def _render(self, template_name, parts, caller):
+        return self.environment.fragment_cache.render(template_name, parts, caller)
+
+
+class FragmentCache(object):
+    def __init__(self, max_entries=4096):
+        self.backend = MemoryBackend(max_entries)
+        self.enabled = True
+        self.templates = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.enabled = config.get('FRAGMENT_CACHE_ENABLED', True)
+        self.backend = MemoryBackend(config.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+        app.extensions['fragments'] = self
+
+    def key(self, template_name, parts):
+        digest = hashlib.sha1(repr((template_name, parts)).encode('utf-8')).hexdigest()
+        return 'fragment:' + digest
+
+    def render(self, template_name, parts, caller):
+        # the cached markup for parts, rendering it with caller() on a miss
+        if not self.enabled:
+            return caller()
+
+        key = self.key(template_name, parts)
+        value = self.backend.get(key)
+        with self._lock:
+            counts = self.templates.setdefault(template_name, [0, 0])
+            counts[0 if value is not None else 1] += 1
+        if value is None:
+            value = caller()
+            self.backend.set(key, str(value))
+        return Markup(value)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            templates = {name: {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / (hits + misses) if hits + misses else None,
+            } for name, (hits, misses) in sorted(self.templates.items())}
+        hits = sum(counts['hits'] for counts in templates.values())
+        misses = sum(counts['misses'] for counts in templates.values())
+        return {
+            'enabled': self.enabled,
+            'entries': len(self.backend),
+            'max_entries': self.backend.max_entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else None,
+            'templates': templates,
+        }
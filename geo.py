@@ -0,0 +1,201 @@
+import csv
+import math
+from datetime import datetime
+
+import geohash
+from extensions import db
+from models import Venue
+
+#----------------------------------------------------------------------------#
+# Venue coordinates and proximity search.
+#----------------------------------------------------------------------------#
+
+# venues carry a latitude and longitude, filled in by hand, by an import
+# row or from an offline lookup file, and the geohash of the two. a
+# proximity search covers the circle's bounding box with at most
+# MAX_CELLS geohash cells, each one range scan of the geohash index, and
+# computes great circle distances for just those rows. it starts small
+# and widens the circle until it holds enough venues, so a search in a
+# dense city reads about as many rows as it returns whatever the radius.
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# the largest radius and result count /venues/near accepts
+MAX_RADIUS_KM = 500
+MAX_RESULTS = 200
+
+# the first circle searched, and how much each retry widens it
+FIRST_RADIUS_KM = 5
+WIDEN = 4
+
+# geohash cells (index range scans) per bounding box
+MAX_CELLS = 16
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    # great circle distance in kilometres
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius):
+    # (min lat, max lat, [(min lng, max lng), ...]) covering every point
+    # within radius km; two longitude ranges when the box crosses the
+    # antimeridian, the full circle near a pole
+    delta_lat = radius / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    if min_lat == -90.0 or max_lat == 90.0:
+        return min_lat, max_lat, [(-180.0, 180.0)]
+
+    delta_lng = math.degrees(math.asin(min(1.0, math.sin(math.radians(delta_lat)) /
+                                           math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - delta_lng, lng + delta_lng
+    if min_lng < -180.0:
+        return min_lat, max_lat, [(min_lng + 360.0, 180.0), (-180.0, max_lng)]
+    if max_lng > 180.0:
+        return min_lat, max_lat, [(min_lng, 180.0), (-180.0, max_lng - 360.0)]
+    return min_lat, max_lat, [(min_lng, max_lng)]
+
+
+def cells(min_lat, max_lat, lng_ranges):
+    # the geohash prefixes of the finest cells covering the box in at most
+    # MAX_CELLS, or None when even the coarsest take more
+    best = None
+    for precision in range(1, geohash.PRECISION + 1):
+        covering = set()
+        for low, high in lng_ranges:
+            covering |= geohash.covering(min_lat, max_lat, low, high, precision)
+        if len(covering) > MAX_CELLS:
+            break
+        best = covering
+    return sorted(best) if best else None
+
+
+def candidates_query(lat, lng, radius):
+    # the venues in the bounding box of the circle, a superset of the
+    # venues within radius km, read by geohash cell
+    min_lat, max_lat, lng_ranges = bounding_box(lat, lng, radius)
+    query = db.session.query(
+        Venue.id, Venue.name, Venue.city, Venue.state, Venue.address,
+        Venue.latitude, Venue.longitude, Venue.upcoming_shows_count
+    ).filter(
+        Venue.latitude.between(min_lat, max_lat),
+        db.or_(*[Venue.longitude.between(low, high) for low, high in lng_ranges]))
+    prefixes = cells(min_lat, max_lat, lng_ranges)
+    if prefixes is not None:
+        # '~' sorts after every geohash character
+        query = query.filter(db.or_(*[
+            db.and_(Venue.geohash >= prefix, Venue.geohash < prefix + '~')
+            for prefix in prefixes]))
+    return query
+
+
+def within(lat, lng, radius):
+    # (distance, row) of the venues within radius km, nearest first
+    results = []
+    for row in candidates_query(lat, lng, radius):
+        distance = haversine(lat, lng, row.latitude, row.longitude)
+        if distance <= radius:
+            results.append((distance, row))
+    results.sort(key=lambda result: (result[0], result[1].id))
+    return results
+
+
+def nearby(lat, lng, radius, limit=50):
+    # the limit venues nearest to (lat, lng) within radius km. once a
+    # smaller circle holds limit venues, they are the nearest ones.
+    search = min(radius, FIRST_RADIUS_KM)
+    results = within(lat, lng, search)
+    while len(results) < limit and search < radius:
+        search = min(radius, search * WIDEN)
+        results = within(lat, lng, search)
+
+    return [{
+        'id': row.id,
+        'name': row.name,
+        'city': row.city,
+        'state': row.state,
+        'address': row.address,
+        'latitude': row.latitude,
+        'longitude': row.longitude,
+        'distance_km': round(distance, 3),
+        'num_upcoming_shows': row.upcoming_shows_count
+    } for distance, row in results[:limit]]
+
+
+#----------------------------------------------------------------------------#
+# Offline geocoding.
+#----------------------------------------------------------------------------#
+
+def _key(*parts):
+    return tuple((part or '').strip().lower() for part in parts)
+
+
+class Lookup(object):
+    # coordinates from a csv file with address, city, state, latitude and
+    # longitude columns. rows without an address geocode a whole city, the
+    # fallback for venues whose street address is not listed.
+    def __init__(self, stream):
+        self.addresses = {}
+        self.cities = {}
+        for row in csv.DictReader(stream):
+            point = (float(row['latitude']), float(row['longitude']))
+            if (row.get('address') or '').strip():
+                self.addresses[_key(row['address'], row['city'], row['state'])] = point
+            else:
+                self.cities[_key(row['city'], row['state'])] = point
+
+    def __len__(self):
+        return len(self.addresses) + len(self.cities)
+
+    def geocode(self, address, city, state):
+        # (latitude, longitude) or None
+        point = self.addresses.get(_key(address, city, state))
+        if point is None:
+            point = self.cities.get(_key(city, state))
+        return point
+
+
+def fill_coordinates(lookup, values):
+    # geocode a venue values dict that has no coordinates yet; returns
+    # whether it has them afterwards
+    if values.get('latitude') is not None and values.get('longitude') is not None:
+        return True
+    point = lookup.geocode(values.get('address'), values.get('city'), values.get('state'))
+    if point is None:
+        return False
+    values['latitude'], values['longitude'] = point
+    return True
+
+
+def geocode_venues(lookup, overwrite=False, batch_size=1000):
+    # fill in venue coordinates from lookup, a batch of rows per UPDATE;
+    # returns (geocoded, not found)
+    query = db.session.query(Venue.id, Venue.address, Venue.city, Venue.state)
+    if not overwrite:
+        query = query.filter(db.or_(Venue.latitude.is_(None), Venue.longitude.is_(None)))
+
+    update = Venue.__table__.update().where(
+        Venue.__table__.c.id == db.bindparam('venue_id')).values(
+        latitude=db.bindparam('lat'), longitude=db.bindparam('lng'),
+        geohash=db.bindparam('hash'), updated_at=datetime.utcnow())
+    geocoded = missing = 0
+    batch = []
+    for venue_id, address, city, state in query.all():
+        point = lookup.geocode(address, city, state)
+        if point is None:
+            missing += 1
+            continue
+        batch.append({'venue_id': venue_id, 'lat': point[0], 'lng': point[1],
+                      'hash': geohash.encode(*point)})
+        if len(batch) >= batch_size:
+            db.session.execute(update, batch)
+            geocoded += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(update, batch)
+        geocoded += len(batch)
+    return geocoded, missing
@@ -0,0 +1,62 @@
+#----------------------------------------------------------------------------#
+# Geohashes.
+#----------------------------------------------------------------------------#
+
+# a geohash interleaves the bits of a point's longitude and latitude, five
+# bits per base32 character, so the points of one cell share a prefix and
+# a cell is one contiguous range of an ordinary btree index. venues store
+# theirs for the proximity search in geo.py.
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# ~5m x 5m cells, finer than the search ever needs
+PRECISION = 9
+
+
+def encode(lat, lng, precision=PRECISION):
+    # the geohash of (lat, lng), or None without coordinates
+    if lat is None or lng is None:
+        return None
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    # (degrees of latitude, degrees of longitude) of a cell
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def covering(min_lat, max_lat, min_lng, max_lng, precision):
+    # the cells of precision overlapping the box. samples a cell apart
+    # from corner to corner hit every row and column of cells it crosses.
+    height, width = cell_size(precision)
+
+    def steps(low, high, step):
+        values = []
+        while low < high:
+            values.append(low)
+            low += step
+        return values + [high]
+
+    return {encode(lat, lng, precision)
+            for lat in steps(min_lat, max_lat, height)
+            for lng in steps(min_lng, max_lng, width)}
@@ -0,0 +1,76 @@
+import os
+
+#----------------------------------------------------------------------------#
+# Gunicorn settings, see wsgi.py.
+#----------------------------------------------------------------------------#
+
+# every setting can be overridden from the environment. each worker holds
+# its own database pools (DB_POOL_SIZE + DB_MAX_OVERFLOW, plus the async
+# read pool); size workers * that against the server's max_connections.
+
+
+def _cpus():
+    # cpus this process may run on, which in a container can be fewer than
+    # the machine has
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+bind = os.getenv('BIND', '0.0.0.0:{}'.format(os.getenv('PORT', 8000)))
+
+# requests spend most of their time waiting on the database, so workers
+# run a few threads each; two workers per cpu keeps every cpu busy while
+# one worker is stalled
+workers = int(os.getenv('WEB_CONCURRENCY', _cpus() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# import the app once in the master: workers fork with the code, templates
+# and tables already loaded, start faster and share memory copy-on-write
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+# recycle workers now and then to bound slow memory growth; the jitter
+# keeps them from restarting all at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.getenv('GUNICORN_ERROR_LOG', '-')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    # the memory cache is per process: a write drops the cached pages of
+    # the worker that handled it, and the others keep serving theirs for up
+    # to CACHE_TTL seconds. more than one worker needs the shared redis
+    # backend, or the cache turned off with CACHE_MAX_ENTRIES=0.
+    import config
+
+    if server.cfg.workers > 1 and config.CACHE_BACKEND == 'memory' and config.CACHE_MAX_ENTRIES:
+        raise RuntimeError(
+            '{} workers would each keep their own page cache; set CACHE_BACKEND=redis, '
+            'WEB_CONCURRENCY=1 or CACHE_MAX_ENTRIES=0'.format(server.cfg.workers))
+
+
+def post_fork(server, worker):
+    # preloading itself opens no connections: create_app does no database
+    # work and wsgi.py only compiles templates and builds the asset
+    # bundles. anything that does query in the master before the fork
+    # leaves its pooled connections there, and a worker that used them
+    # would share sockets with its siblings, so each worker's pool is
+    # reset all the same. close=False leaves those to the master, and each
+    # worker opens its own on first use. the background job pool is dropped too in
+    # case the master started one; the next job builds it afresh. the async
+    # read loop checks the pid itself (see aio.py).
+    from wsgi import app
+    from extensions import db, queue
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    queue.broker.shutdown(wait=False)
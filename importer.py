@@ -0,0 +1,321 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+import counters
+import feed
+import geohash
+from extensions import db, cache
+from forms import VenueForm, ArtistForm, ShowForm
+from formatting import to_utc
+from conflicts import BookingChecker
+from geo import fill_coordinates
+from models import Venue, Artist, Show, Genre, DEFAULT_SHOW_DURATION
+from queries import venue_key, artist_key
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows.
+#----------------------------------------------------------------------------#
+
+# files are streamed row by row and handled in chunks: each chunk is
+# validated with the same form classes the create pages use, its valid
+# rows are written with one batched INSERT (or a COPY on PostgreSQL) and
+# committed, and its invalid rows are reported and skipped. a chunk the
+# database rejects as a whole is rolled back and its rows reported too.
+# memory use is bounded by the chunk size, not the file size.
+
+
+def read_rows(stream, format):
+    # yield (line number, row dict) pairs from a csv or jsonl stream
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_num, line in enumerate(stream, 1):
+            if line.strip():
+                yield line_num, json.loads(line)
+    else:
+        raise ValueError('unknown import format {!r}'.format(format))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _formdata(row):
+    # forms expect every value as a string; genres may arrive as a json
+    # list or as a comma separated csv cell
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'genres' and isinstance(value, str):
+            value = [genre.strip() for genre in value.split(',') if genre.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        elif isinstance(value, bool):
+            formdata.add(key, 'y' if value else '')
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def validate(form_class, row):
+    # return (form, errors) for row using the create page's form rules
+    formdata = _formdata(row)
+    form = form_class(formdata=formdata, meta={'csrf': False})
+    form.validate()
+
+    errors = dict(form.errors)
+    # a field that is missing from the row entirely would silently take
+    # the form's default, e.g. ShowForm.start_time
+    for name, field in form._fields.items():
+        if field.flags.required and name not in formdata:
+            errors[name] = ['This field is required.']
+    return form, errors
+
+
+def venue_values(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'address': form.address.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'facebook_link': form.facebook_link.data,
+        'seeking_talent': form.seeking_talent.data,
+        'seeking_description': form.seeking_description.data,
+        'latitude': form.latitude.data,
+        'longitude': form.longitude.data,
+        'timezone': form.timezone.data,
+        'genres': form.genres.data,
+    }
+
+
+def artist_values(form):
+    return {
+        'name': form.name.data,
+        'city': form.city.data,
+        'state': form.state.data,
+        'phone': form.phone.data,
+        'image_link': form.image_link.data,
+        'website': form.website_link.data,
+        'facebook_link': form.facebook_link.data,
+        'seeking_venue': form.seeking_venue.data,
+        'seeking_description': form.seeking_description.data,
+        'genres': form.genres.data,
+    }
+
+
+def show_values(form):
+    return {
+        'artist_id': int(form.artist_id.data),
+        'venue_id': int(form.venue_id.data),
+        'start_time': form.start_time.data,
+        'end_time': form.end_time.data or form.start_time.data + DEFAULT_SHOW_DURATION,
+    }
+
+
+# kind -> (model, form, form -> column values)
+KINDS = {
+    'venues': (Venue, VenueForm, venue_values),
+    'artists': (Artist, ArtistForm, artist_values),
+    'shows': (Show, ShowForm, show_values),
+}
+
+
+def _check_show_references(checked):
+    # reject shows whose artist or venue does not exist, looking up the
+    # whole chunk's ids in one query per table. the venue's timezone gives
+    # each show its UTC start, set here since COPY skips the column default.
+    artist_ids = set()
+    venue_ids = set()
+    for line_num, values, errors in checked:
+        if values is not None:
+            artist_ids.add(values['artist_id'])
+            venue_ids.add(values['venue_id'])
+
+    known_artists = {artist_id for artist_id, in db.session.query(Artist.id).filter(
+        Artist.id.in_(artist_ids))} if artist_ids else set()
+    known_venues = dict(db.session.query(Venue.id, Venue.timezone).filter(
+        Venue.id.in_(venue_ids))) if venue_ids else {}
+
+    for line_num, values, errors in checked:
+        if values is None:
+            continue
+        if values['artist_id'] not in known_artists:
+            errors['artist_id'] = ['No artist with id {}.'.format(values['artist_id'])]
+        if values['venue_id'] not in known_venues:
+            errors['venue_id'] = ['No venue with id {}.'.format(values['venue_id'])]
+        else:
+            values['starts_at'] = to_utc(values['start_time'], known_venues[values['venue_id']])
+
+
+def _check_show_conflicts(checked, checker):
+    # reject shows that overlap an existing show, or an earlier row of the
+    # import, at the same venue or with the same artist
+    checked = [(line_num, values, errors) for line_num, values, errors in checked
+               if values is not None and not errors]
+    checker.load([values for line_num, values, errors in checked])
+    for line_num, values, errors in checked:
+        reasons = checker.check(values, 'line {}'.format(line_num))
+        if reasons:
+            errors['start_time'] = reasons
+
+
+def _copy_literal(value):
+    # render a value for COPY ... WITH (FORMAT csv)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+
+def _copy(table, rows):
+    # stream rows into the table with COPY, via an in-memory csv buffer
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_literal(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+            table.name, ', '.join(columns)), buffer)
+    finally:
+        cursor.close()
+
+
+def _insert_rows(table, rows, use_copy, returning_ids=False):
+    # insert rows, returning their new ids in order if asked. COPY cannot
+    # return anything, so the ids are drawn from the sequence up front.
+    if use_copy:
+        ids = None
+        if returning_ids:
+            ids = db.session.execute(db.text(
+                "SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                "FROM generate_series(1, :count)"),
+                {'table': table.name, 'count': len(rows)}).scalars().all()
+            rows = [dict(row, id=row_id) for row, row_id in zip(rows, ids)]
+        _copy(table, rows)
+        return ids
+    if returning_ids:
+        return db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True),
+            rows).scalars().all()
+    db.session.execute(table.insert(), rows)
+
+
+def _insert(model, rows, use_copy):
+    # venues and artists carry their genres as a list of names, which go
+    # to the association table once the rows have ids
+    if 'genres' not in rows[0]:
+        _insert_rows(model.__table__, rows, use_copy)
+        return
+
+    ids = _insert_rows(model.__table__, [
+        {column: value for column, value in row.items() if column != 'genres'}
+        for row in rows], use_copy, returning_ids=True)
+
+    link = model.genre_objects.property.secondary
+    owner_column = '{}_id'.format(model.__tablename__)
+    genre_ids = dict(db.session.query(Genre.name, Genre.id))
+    links = [{owner_column: owner_id, 'genre_id': genre_ids[name]}
+             for owner_id, row in zip(ids, rows) for name in set(row['genres'])]
+    if links:
+        _insert_rows(link, links, use_copy)
+
+
+def _invalidate(kind, rows):
+    # new shows change their venue's and artist's detail pages
+    if kind == 'shows':
+        keys = set()
+        for row in rows:
+            keys.add(venue_key(row['venue_id']))
+            keys.add(artist_key(row['artist_id']))
+        cache.invalidate(*keys)
+
+
+def import_rows(kind, rows, chunk_size=1000, use_copy=False, on_error=None,
+                lookup=None):
+    # import (line number, row dict) pairs; returns (imported, failed).
+    # on_error(line number, errors) is called for every rejected row.
+    # venues without coordinates are geocoded from lookup, a geo.Lookup,
+    # when one is given.
+    model, form_class, to_values = KINDS[kind]
+    imported = failed = 0
+    checker = BookingChecker() if kind == 'shows' else None
+
+    for chunk in chunked(rows, chunk_size):
+        checked = []
+        for line_num, row in chunk:
+            form, errors = validate(form_class, row)
+            values = None
+            if not errors:
+                try:
+                    values = to_values(form)
+                except (TypeError, ValueError) as error:
+                    errors = {'row': [str(error)]}
+            checked.append((line_num, values, errors))
+
+        if kind == 'shows':
+            _check_show_references(checked)
+            _check_show_conflicts(checked, checker)
+
+        valid = []
+        valid_lines = []
+        for line_num, values, errors in checked:
+            if errors:
+                failed += 1
+                if on_error is not None:
+                    on_error(line_num, errors)
+            else:
+                if kind == 'venues':
+                    if lookup is not None:
+                        fill_coordinates(lookup, values)
+                    # set here since COPY skips the column default
+                    values['geohash'] = geohash.encode(values['latitude'], values['longitude'])
+                valid.append(values)
+                valid_lines.append(line_num)
+
+        if valid:
+            try:
+                _insert(model, valid, use_copy)
+                if kind == 'shows':
+                    # bulk inserts skip the ORM events that keep counters current
+                    counters.recount_shows(
+                        (row['venue_id'], row['artist_id']) for row in valid)
+                db.session.commit()
+            except (SQLAlchemyError, db.engine.dialect.loaded_dbapi.Error) as error:
+                # e.g. a venue deleted since the chunk was checked. earlier
+                # chunks stay committed, so the chunk's rows are reported
+                # and the import goes on with the next one.
+                db.session.rollback()
+                failed += len(valid)
+                if on_error is not None:
+                    message = str(getattr(error, 'orig', None) or error).strip().split('\n')[0]
+                    for line_num in valid_lines:
+                        on_error(line_num, {'row': [message]})
+                continue
+            _invalidate(kind, valid)
+            # core inserts are invisible to the feed's session hooks
+            feed.request_refresh()
+            imported += len(valid)
+
+    return imported, failed
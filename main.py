@@ -0,0 +1,151 @@
+import hmac
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, current_app, render_template, request, Response, abort, \
+    jsonify, stream_with_context
+
+from extensions import db, assets, cache, fragments, queue, reads
+import feed
+import pool_metrics
+
+#----------------------------------------------------------------------------#
+# Home page, exports and operational endpoints.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('main', __name__)
+
+
+@blueprint.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@blueprint.route('/export/<kind>.<format>')
+def export(kind, format):
+    # stream a full dump of venues, artists or shows as csv or ndjson,
+    # optionally gzipped and filtered by city, state and show date range
+    # the exporter is only loaded by the first export
+    import exporter
+
+    if kind not in exporter.EXPORT_COLUMNS or format not in exporter.FORMATS:
+        abort(404)
+
+    try:
+        start = request.args.get('start')
+        start = datetime.fromisoformat(start) if start else None
+        end = request.args.get('end')
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        abort(400)
+
+    compress = request.args.get('gzip', type=int) == 1
+    try:
+        chunks = exporter.export(kind, format, compress=compress,
+                                 city=request.args.get('city'),
+                                 state=request.args.get('state'),
+                                 start=start, end=end)
+    except ValueError:
+        # a date range on venues or artists
+        abort(400)
+
+    filename = '{}.{}'.format(kind, format)
+    if compress:
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    else:
+        mimetype = exporter.FORMATS[format]
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': 'attachment; filename=' + filename})
+
+
+#  Internal
+#  ----------------------------------------------------------------
+
+def internal(view):
+    # job arguments and process internals are for operators only: a
+    # request needs the INTERNAL_TOKEN bearer token, or debug mode when no
+    # token is configured
+    @wraps(view)
+    def guarded(*args, **kwargs):
+        token = current_app.config.get('INTERNAL_TOKEN')
+        if not token:
+            if not current_app.debug:
+                abort(404)
+        elif not hmac.compare_digest(request.headers.get('Authorization', ''),
+                                     'Bearer ' + token):
+            abort(403)
+        return view(*args, **kwargs)
+    return guarded
+
+
+@blueprint.route('/internal/cache')
+@internal
+def cache_stats():
+    # hit/miss counters for sizing the detail page cache
+    return jsonify(cache.stats())
+
+
+@blueprint.route('/internal/pool')
+@internal
+def pool_stats():
+    # connection pool occupancy plus checkout wait and hold time histograms,
+    # and the async read pool's status
+    data = pool_metrics.pool_status(db.engine)
+    data['async_reads'] = reads.stats()
+    return jsonify(data)
+
+
+@blueprint.route('/internal/fragments')
+@internal
+def fragment_stats():
+    # per template hit ratios of the rendered fragment cache
+    return jsonify(fragments.stats())
+
+
+@blueprint.route('/internal/assets')
+@internal
+def asset_stats():
+    # the built bundles and their sizes per content coding
+    return jsonify(assets.stats())
+
+
+@blueprint.route('/internal/feed')
+@internal
+def feed_stats():
+    # refresh timings and staleness of the show feed
+    return jsonify(feed.stats())
+
+
+@blueprint.route('/internal/tasks')
+@internal
+def task_stats():
+    # registered tasks, broker and job counts by status
+    return jsonify(queue.stats())
+
+
+#  Jobs
+#  ----------------------------------------------------------------
+
+@blueprint.route('/jobs/<job_id>')
+@internal
+def job_status(job_id):
+    # status of a background job, e.g. one named in a response's X-Job-Id
+    job = queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'unknown job'}), 404
+    return jsonify(job.to_dict())
+
+
+@blueprint.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+
+@blueprint.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
@@ -0,0 +1,66 @@
+"""full-text and trigram search for venues and artists
+
+Revision ID: 3c9e5f7a1b20
+Revises: 1a2b3c4d5e6f
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3c9e5f7a1b20'
+down_revision = '1a2b3c4d5e6f'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}city, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string({row}genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(SEARCH_VECTOR.format(row='NEW.')))
+
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column(
+            'search_vector', postgresql.TSVECTOR(), nullable=True))
+
+        # backfill existing rows before the trigger takes over
+        op.execute('UPDATE {} SET search_vector = {}'.format(
+            table, SEARCH_VECTOR.format(row='')))
+
+        op.execute("""
+            CREATE TRIGGER {0}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF name, city, genres ON {0}
+            FOR EACH ROW EXECUTE PROCEDURE search_vector_update()
+        """.format(table))
+
+        op.create_index('ix_{}_search_vector'.format(table), table,
+                        ['search_vector'], postgresql_using='gin')
+        op.create_index('ix_{}_name_trgm'.format(table), table, ['name'],
+                        postgresql_using='gin',
+                        postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{}_name_trgm'.format(table), table_name=table)
+        op.drop_index('ix_{}_search_vector'.format(table), table_name=table)
+        op.execute('DROP TRIGGER IF EXISTS {0}_search_vector_trigger ON {0}'.format(table))
+        op.drop_column(table, 'search_vector')
+
+    op.execute('DROP FUNCTION IF EXISTS search_vector_update()')
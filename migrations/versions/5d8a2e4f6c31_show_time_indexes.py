@@ -0,0 +1,31 @@
+"""composite indexes for show time-range queries
+
+Revision ID: 5d8a2e4f6c31
+Revises: 3c9e5f7a1b20
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d8a2e4f6c31'
+down_revision = '3c9e5f7a1b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_show_venue_id_start_time', 'show',
+                    ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show',
+                    ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_show_start_time', 'show',
+                    ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time', table_name='show')
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
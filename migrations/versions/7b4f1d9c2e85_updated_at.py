@@ -0,0 +1,31 @@
+"""row versions for API ETags
+
+Revision ID: 7b4f1d9c2e85
+Revises: 5d8a2e4f6c31
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b4f1d9c2e85'
+down_revision = '5d8a2e4f6c31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist', 'show'):
+        # the server default also backfills existing rows
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.func.now()))
+        op.create_index('ix_{}_updated_at'.format(table), table, ['updated_at'],
+                        unique=False)
+
+
+def downgrade():
+    for table in ('show', 'artist', 'venue'):
+        op.drop_index('ix_{}_updated_at'.format(table), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,50 @@
+"""denormalized show counters on venue and artist
+
+Revision ID: 9e3a6c1f4b72
+Revises: 7b4f1d9c2e85
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3a6c1f4b72'
+down_revision = '7b4f1d9c2e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(),
+                                       nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(),
+                                       nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+        op.create_index('ix_{}_next_show_at'.format(table), table, ['next_show_at'],
+                        unique=False)
+        op.create_index('ix_{}_name_id'.format(table), table, ['name', 'id'],
+                        unique=False)
+
+        # backfill from the existing shows; afterwards counters.py keeps
+        # them current
+        op.execute("""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.start_time > now()),
+                past_shows_count = (SELECT count(*) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.start_time <= now()),
+                next_show_at = (SELECT min(show.start_time) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.start_time > now())
+        """.format(table=table))
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index('ix_{}_name_id'.format(table), table_name=table)
+        op.drop_index('ix_{}_next_show_at'.format(table), table_name=table)
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
@@ -0,0 +1,28 @@
+"""venue and artist names are required, as the listings page by them
+
+Revision ID: a4c9e2f7b153
+Revises: d3f7a2c5e814
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a4c9e2f7b153'
+down_revision = 'd3f7a2c5e814'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a NULL name drops the row out of every keyset page after the first;
+    # the forms have always required one, so only stray rows are affected
+    for table in ('venue', 'artist'):
+        op.execute("UPDATE {} SET name = '' WHERE name IS NULL".format(table))
+        op.alter_column(table, 'name', existing_type=sa.String(), nullable=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.alter_column(table, 'name', existing_type=sa.String(), nullable=True)
@@ -0,0 +1,39 @@
+"""show_feed materialized view behind /shows
+
+Revision ID: a7c3e9d5f148
+Revises: f2a9b6c4d817
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d5f148'
+down_revision = 'f2a9b6c4d817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE MATERIALIZED VIEW show_feed AS
+        SELECT show.id AS show_id, show.start_time, show.end_time,
+               venue.id AS venue_id, venue.name AS venue_name,
+               venue.city AS venue_city, venue.state AS venue_state,
+               artist.id AS artist_id, artist.name AS artist_name,
+               artist.image_link AS artist_image_link,
+               now()::timestamp AS refreshed_at
+        FROM show
+        JOIN venue ON venue.id = show.venue_id
+        JOIN artist ON artist.id = show.artist_id
+    """)
+    # required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute('CREATE UNIQUE INDEX ux_show_feed_show_id ON show_feed (show_id)')
+    op.execute('CREATE INDEX ix_show_feed_start_time ON show_feed (start_time, show_id)')
+    op.execute('CREATE INDEX ix_show_feed_city_state ON show_feed '
+               '(venue_city, venue_state, start_time, show_id)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS show_feed')
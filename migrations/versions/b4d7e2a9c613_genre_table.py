@@ -0,0 +1,151 @@
+"""genre table replacing the venue and artist genre arrays
+
+Revision ID: b4d7e2a9c613
+Revises: 9e3a6c1f4b72
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'b4d7e2a9c613'
+down_revision = '9e3a6c1f4b72'
+branch_labels = None
+depends_on = None
+
+
+# the choices forms.py offered before genres moved into the database
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic',
+          'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+          'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+          'Soul', 'Other']
+
+SEARCH_VECTOR_FUNCTION = """
+    CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(genre.name, ' ') FROM {table}_genre
+                JOIN genre ON genre.id = {table}_genre.genre_id
+                WHERE {table}_genre.{table}_id = NEW.id), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+GENRE_LINK_FUNCTION = """
+    CREATE OR REPLACE FUNCTION {table}_genre_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE {table} SET name = name WHERE id = OLD.{table}_id;
+        ELSE
+            UPDATE {table} SET name = name WHERE id = NEW.{table}_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+# as in 3c9e5f7a1b20_search_vectors.py
+ARRAY_SEARCH_VECTOR = """
+    setweight(to_tsvector('simple', coalesce({row}name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce({row}city, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce(array_to_string({row}genres, ' '), '')), 'C')
+"""
+
+
+def upgrade():
+    genre = op.create_table(
+        'genre',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name')
+    )
+    op.bulk_insert(genre, [{'name': name} for name in GENRES])
+
+    for table in ('venue', 'artist'):
+        op.create_table(
+            '{}_genre'.format(table),
+            sa.Column('{}_id'.format(table), sa.Integer(), nullable=False),
+            sa.Column('genre_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['{}_id'.format(table)], ['{}.id'.format(table)],
+                                    ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['genre_id'], ['genre.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('{}_id'.format(table), 'genre_id')
+        )
+        op.create_index('ix_{}_genre_genre_id'.format(table), '{}_genre'.format(table),
+                        ['genre_id', '{}_id'.format(table)], unique=False)
+        op.create_index('ix_{}_city_state'.format(table), table, ['city', 'state'],
+                        unique=False)
+
+        # keep genres that were stored but never offered by the form
+        op.execute("""
+            INSERT INTO genre (name)
+            SELECT DISTINCT unnest(genres) FROM {0}
+            ON CONFLICT (name) DO NOTHING
+        """.format(table))
+        op.execute("""
+            INSERT INTO {0}_genre ({0}_id, genre_id)
+            SELECT DISTINCT {0}.id, genre.id
+            FROM {0} CROSS JOIN LATERAL unnest({0}.genres) AS linked(name)
+            JOIN genre ON genre.name = linked.name
+        """.format(table))
+
+        # the search vector now reads genres from the association table
+        op.execute('DROP TRIGGER IF EXISTS {0}_search_vector_trigger ON {0}'.format(table))
+        op.drop_column(table, 'genres')
+        op.execute(SEARCH_VECTOR_FUNCTION.format(table=table))
+        op.execute("""
+            CREATE TRIGGER {0}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF name, city ON {0}
+            FOR EACH ROW EXECUTE PROCEDURE {0}_search_vector_update()
+        """.format(table))
+        op.execute(GENRE_LINK_FUNCTION.format(table=table))
+        op.execute("""
+            CREATE TRIGGER {0}_genre_trigger
+            AFTER INSERT OR DELETE ON {0}_genre
+            FOR EACH ROW EXECUTE PROCEDURE {0}_genre_changed()
+        """.format(table))
+
+    op.execute('DROP FUNCTION IF EXISTS search_vector_update()')
+
+
+def downgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """.format(ARRAY_SEARCH_VECTOR.format(row='NEW.')))
+
+    for table in ('artist', 'venue'):
+        op.add_column(table, sa.Column('genres', postgresql.ARRAY(sa.String()),
+                                       nullable=True))
+        op.execute("""
+            UPDATE {0} SET genres = (
+                SELECT array_agg(genre.name ORDER BY genre.name) FROM {0}_genre
+                JOIN genre ON genre.id = {0}_genre.genre_id
+                WHERE {0}_genre.{0}_id = {0}.id)
+        """.format(table))
+
+        op.execute('DROP TRIGGER IF EXISTS {0}_search_vector_trigger ON {0}'.format(table))
+        op.execute('DROP FUNCTION IF EXISTS {}_search_vector_update()'.format(table))
+        op.execute("""
+            CREATE TRIGGER {0}_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF name, city, genres ON {0}
+            FOR EACH ROW EXECUTE PROCEDURE search_vector_update()
+        """.format(table))
+
+        op.drop_index('ix_{}_city_state'.format(table), table_name=table)
+        op.drop_index('ix_{}_genre_genre_id'.format(table), table_name='{}_genre'.format(table))
+        op.drop_table('{}_genre'.format(table))
+        op.execute('DROP FUNCTION IF EXISTS {}_genre_changed()'.format(table))
+
+    op.drop_table('genre')
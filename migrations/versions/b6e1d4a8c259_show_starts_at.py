@@ -0,0 +1,58 @@
+"""show start times in UTC, for telling past from upcoming shows
+
+Revision ID: b6e1d4a8c259
+Revises: e5b2c7d9a461
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from formatting import to_utc
+
+# revision identifiers, used by Alembic.
+revision = 'b6e1d4a8c259'
+down_revision = 'e5b2c7d9a461'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('show', sa.Column('starts_at', sa.DateTime(), nullable=True))
+
+    show = sa.table('show', sa.column('id', sa.Integer), sa.column('venue_id', sa.Integer),
+                    sa.column('start_time', sa.DateTime), sa.column('starts_at', sa.DateTime))
+    venue = sa.table('venue', sa.column('id', sa.Integer), sa.column('timezone', sa.String))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(show.c.id, show.c.start_time, venue.c.timezone).join_from(
+        show, venue, venue.c.id == show.c.venue_id).where(show.c.start_time.isnot(None))).all()
+    if rows:
+        connection.execute(
+            show.update().where(show.c.id == sa.bindparam('show_id')).values(
+                starts_at=sa.bindparam('utc')),
+            [{'show_id': row.id, 'utc': to_utc(row.start_time, row.timezone)} for row in rows])
+
+    op.create_index('ix_show_venue_id_starts_at', 'show', ['venue_id', 'starts_at'], unique=False)
+    op.create_index('ix_show_artist_id_starts_at', 'show', ['artist_id', 'starts_at'], unique=False)
+    op.create_index('ix_show_starts_at', 'show', ['starts_at', 'id'], unique=False)
+    op.drop_index('ix_show_start_time', table_name='show')
+
+    # the counters' next_show_at is compared with UTC from now on
+    for table in ('venue', 'artist'):
+        op.execute("""
+            UPDATE {table} SET
+                upcoming_shows_count = (SELECT count(*) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.starts_at > now() AT TIME ZONE 'UTC'),
+                past_shows_count = (SELECT count(*) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.starts_at <= now() AT TIME ZONE 'UTC'),
+                next_show_at = (SELECT min(show.starts_at) FROM show
+                    WHERE show.{table}_id = {table}.id AND show.starts_at > now() AT TIME ZONE 'UTC')
+        """.format(table=table))
+
+
+def downgrade():
+    op.create_index('ix_show_start_time', 'show', ['start_time', 'id'], unique=False)
+    op.drop_index('ix_show_starts_at', table_name='show')
+    op.drop_index('ix_show_artist_id_starts_at', table_name='show')
+    op.drop_index('ix_show_venue_id_starts_at', table_name='show')
+    op.drop_column('show', 'starts_at')
@@ -0,0 +1,49 @@
+"""venue timezones, carried into the show feed
+
+Revision ID: c8e4f1a6b392
+Revises: a7c3e9d5f148
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c8e4f1a6b392'
+down_revision = 'a7c3e9d5f148'
+branch_labels = None
+depends_on = None
+
+
+SHOW_FEED = """
+    CREATE MATERIALIZED VIEW show_feed AS
+    SELECT show.id AS show_id, show.start_time, show.end_time,
+           venue.id AS venue_id, venue.name AS venue_name,
+           venue.city AS venue_city, venue.state AS venue_state,{timezone}
+           artist.id AS artist_id, artist.name AS artist_name,
+           artist.image_link AS artist_image_link,
+           now()::timestamp AS refreshed_at
+    FROM show
+    JOIN venue ON venue.id = show.venue_id
+    JOIN artist ON artist.id = show.artist_id
+"""
+
+
+def create_show_feed(timezone):
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS show_feed')
+    op.execute(SHOW_FEED.format(
+        timezone='\n           venue.timezone AS venue_timezone,' if timezone else ''))
+    op.execute('CREATE UNIQUE INDEX ux_show_feed_show_id ON show_feed (show_id)')
+    op.execute('CREATE INDEX ix_show_feed_start_time ON show_feed (start_time, show_id)')
+    op.execute('CREATE INDEX ix_show_feed_city_state ON show_feed '
+               '(venue_city, venue_state, start_time, show_id)')
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('timezone', sa.String(length=64), nullable=True))
+    create_show_feed(timezone=True)
+
+
+def downgrade():
+    create_show_feed(timezone=False)
+    op.drop_column('venue', 'timezone')
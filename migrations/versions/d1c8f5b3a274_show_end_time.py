@@ -0,0 +1,56 @@
+"""show end times and double booking constraints
+
+Revision ID: d1c8f5b3a274
+Revises: b4d7e2a9c613
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd1c8f5b3a274'
+down_revision = 'b4d7e2a9c613'
+branch_labels = None
+depends_on = None
+
+
+# existing shows get models.DEFAULT_SHOW_DURATION
+DEFAULT_DURATION = "interval '2 hours'"
+
+OVERLAPS = """
+    SELECT a.id, b.id FROM show a JOIN show b
+    ON a.{0}_id = b.{0}_id AND a.id < b.id
+    AND tsrange(a.start_time, a.end_time) && tsrange(b.start_time, b.end_time)
+    LIMIT 10
+"""
+
+
+def upgrade():
+    op.add_column('show', sa.Column('end_time', sa.DateTime(), nullable=True))
+    op.execute('UPDATE show SET end_time = start_time + {} '
+               'WHERE start_time IS NOT NULL'.format(DEFAULT_DURATION))
+    op.create_check_constraint('ck_show_end_after_start', 'show',
+                               'end_time > start_time')
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    connection = op.get_bind()
+    for owner in ('venue', 'artist'):
+        # the constraint cannot be added over existing double bookings;
+        # name some so they can be fixed by hand first
+        clashes = connection.execute(sa.text(OVERLAPS.format(owner))).fetchall()
+        if clashes:
+            raise RuntimeError('overlapping shows for the same {}: {}'.format(
+                owner, ', '.join('{} and {}'.format(*pair) for pair in clashes)))
+        op.execute("""
+            ALTER TABLE show ADD CONSTRAINT ex_show_{0}_overlap
+            EXCLUDE USING gist ({0}_id WITH =, tsrange(start_time, end_time) WITH &&)
+            WHERE (start_time IS NOT NULL AND end_time IS NOT NULL)
+        """.format(owner))
+
+
+def downgrade():
+    for owner in ('artist', 'venue'):
+        op.drop_constraint('ex_show_{}_overlap'.format(owner), 'show')
+    op.drop_constraint('ck_show_end_after_start', 'show', type_='check')
+    op.drop_column('show', 'end_time')
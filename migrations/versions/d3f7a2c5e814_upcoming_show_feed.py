@@ -0,0 +1,70 @@
+"""show_feed holds upcoming shows only, its refresh time kept apart
+
+Revision ID: d3f7a2c5e814
+Revises: b6e1d4a8c259
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'd3f7a2c5e814'
+down_revision = 'b6e1d4a8c259'
+branch_labels = None
+depends_on = None
+
+
+SHOW_FEED = """
+    CREATE MATERIALIZED VIEW show_feed AS
+    SELECT show.id AS show_id, show.start_time, show.end_time, show.starts_at,
+           venue.id AS venue_id, venue.name AS venue_name,
+           venue.city AS venue_city, venue.state AS venue_state,
+           venue.timezone AS venue_timezone, venue.image_link AS venue_image_link,
+           artist.id AS artist_id, artist.name AS artist_name,
+           artist.image_link AS artist_image_link
+    FROM show
+    JOIN venue ON venue.id = show.venue_id
+    JOIN artist ON artist.id = show.artist_id
+    WHERE show.starts_at >= now() AT TIME ZONE 'UTC'
+"""
+
+PREVIOUS_SHOW_FEED = """
+    CREATE MATERIALIZED VIEW show_feed AS
+    SELECT show.id AS show_id, show.start_time, show.end_time,
+           venue.id AS venue_id, venue.name AS venue_name,
+           venue.city AS venue_city, venue.state AS venue_state,
+           venue.timezone AS venue_timezone,
+           artist.id AS artist_id, artist.name AS artist_name,
+           artist.image_link AS artist_image_link,
+           now()::timestamp AS refreshed_at
+    FROM show
+    JOIN venue ON venue.id = show.venue_id
+    JOIN artist ON artist.id = show.artist_id
+"""
+
+
+def create_show_feed(definition, time_column):
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS show_feed')
+    op.execute(definition)
+    # required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute('CREATE UNIQUE INDEX ux_show_feed_show_id ON show_feed (show_id)')
+    op.execute('CREATE INDEX ix_show_feed_{0} ON show_feed ({0}, show_id)'.format(time_column))
+    op.execute('CREATE INDEX ix_show_feed_city_state ON show_feed '
+               '(venue_city, venue_state, {}, show_id)'.format(time_column))
+
+
+def upgrade():
+    create_show_feed(SHOW_FEED, 'starts_at')
+    op.create_table(
+        'show_feed_refresh',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.execute("INSERT INTO show_feed_refresh VALUES (1, now() AT TIME ZONE 'UTC')")
+
+
+def downgrade():
+    op.drop_table('show_feed_refresh')
+    create_show_feed(PREVIOUS_SHOW_FEED, 'start_time')
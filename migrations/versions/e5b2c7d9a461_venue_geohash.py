@@ -0,0 +1,46 @@
+"""venue geohashes for proximity search
+
+Revision ID: e5b2c7d9a461
+Revises: c8e4f1a6b392
+Create Date: 2026-10-18 19:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from geohash import encode
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2c7d9a461'
+down_revision = 'c8e4f1a6b392'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column(
+        'geohash', sa.String(length=12).with_variant(
+            postgresql.VARCHAR(length=12, collation='C'), 'postgresql'),
+        nullable=True))
+
+    venue = sa.table('venue', sa.column('id', sa.Integer), sa.column('latitude', sa.Float),
+                     sa.column('longitude', sa.Float), sa.column('geohash', sa.String))
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(venue.c.id, venue.c.latitude, venue.c.longitude).where(
+        venue.c.latitude.isnot(None), venue.c.longitude.isnot(None))).all()
+    if rows:
+        connection.execute(
+            venue.update().where(venue.c.id == sa.bindparam('venue_id')).values(
+                geohash=sa.bindparam('hash')),
+            [{'venue_id': row.id, 'hash': encode(row.latitude, row.longitude)} for row in rows])
+
+    op.create_index('ix_venue_geohash', 'venue', ['geohash'], unique=False)
+    op.drop_index('ix_venue_latitude_longitude', table_name='venue')
+
+
+def downgrade():
+    op.create_index('ix_venue_latitude_longitude', 'venue', ['latitude', 'longitude'],
+                    unique=False)
+    op.drop_index('ix_venue_geohash', table_name='venue')
+    op.drop_column('venue', 'geohash')
@@ -0,0 +1,28 @@
+"""venue coordinates for proximity search
+
+Revision ID: f2a9b6c4d817
+Revises: d1c8f5b3a274
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'f2a9b6c4d817'
+down_revision = 'd1c8f5b3a274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.create_index('ix_venue_latitude_longitude', 'venue', ['latitude', 'longitude'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_venue_latitude_longitude', table_name='venue')
+    op.drop_column('venue', 'longitude')
+    op.drop_column('venue', 'latitude')
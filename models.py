@@ -1,12 +1,70 @@
 
+from datetime import datetime, timedelta
+
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR, VARCHAR
+from sqlalchemy.ext.associationproxy import association_proxy
+
 from extensions import db
+from formatting import to_utc
+from geohash import encode as encode_geohash
+
+# postgres type, stored as text when the benchmarks run on sqlite
+SearchVector = TSVECTOR().with_variant(db.Text(), 'sqlite')
+# compared byte by byte, so a cell's prefix range is what it seems under
+# any database collation
+Geohash = db.String(12).with_variant(VARCHAR(12, collation='C'), 'postgresql')
+
+# the genres a new database starts with
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Electronic',
+          'Folk', 'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+          'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll',
+          'Soul', 'Other']
+
+
+class Genre(db.Model):
+    __tablename__ = 'genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+    @classmethod
+    def named(cls, name):
+        # the genre called name, so venue.genres can be assigned a list of
+        # names
+        with db.session.no_autoflush:
+            return cls.query.filter_by(name=name).one_or_none() or cls(name=name)
+
+
+def genre_link_table(owner):
+    # association table between genre and owner ('venue' or 'artist'). the
+    # primary key serves lookups by owner; the second index serves the
+    # genre filters on the listings
+    return db.Table(
+        '{}_genre'.format(owner),
+        db.Column('{}_id'.format(owner), db.Integer,
+                  db.ForeignKey('{}.id'.format(owner), ondelete='CASCADE'),
+                  primary_key=True),
+        db.Column('genre_id', db.Integer,
+                  db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+        db.Index('ix_{}_genre_genre_id'.format(owner), 'genre_id', '{}_id'.format(owner)),
+    )
+
+
+venue_genre = genre_link_table('venue')
+artist_genre = genre_link_table('artist')
+
+
+def _default_geohash(context):
+    parameters = context.get_current_parameters()
+    return encode_geohash(parameters.get('latitude'), parameters.get('longitude'))
 
 
 class Venue(db.Model):
     __tablename__ = 'venue'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -15,25 +73,64 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
 
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.ARRAY(db.String))
+    genre_objects = db.relationship('Genre', secondary=venue_genre,
+                                    order_by=Genre.name)
+    # genre names, assignable as a list of strings
+    genres = association_proxy('genre_objects', 'name', creator=Genre.named)
     website = db.Column(db.String(120))
     seeking_description = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
+    # bumped on every write; drives API ETags and Last-Modified
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now())
+    # show counters read by the listings, maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                 server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+    # WGS84 coordinates for proximity search, see geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # derived from them on insert, core inserts included, and on ORM updates
+    geohash = db.Column(Geohash, default=_default_geohash)
+    # IANA zone of the venue's show times, which are stored as local times
+    timezone = db.Column(db.String(64))
+
+    # weighted name/city/genres document maintained by triggers, see
+    # search.py
+    search_vector = db.deferred(db.Column(SearchVector))
 
     # create one-to-many relationship with shows table
     artists = db.relationship('Artist', secondary='show')
     shows = db.relationship('Show', backref=('venues'))
 
+    __table_args__ = (
+        db.Index('ix_venue_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        # the listing pages by (name, id), optionally filtered by area
+        db.Index('ix_venue_name_id', 'name', 'id'),
+        db.Index('ix_venue_city_state', 'city', 'state'),
+        # one range scan per geohash cell of /venues/near
+        db.Index('ix_venue_geohash', 'geohash'),
+    )
+
 
 class Artist(db.Model):
     __tablename__ = 'artist'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String))
+    genre_objects = db.relationship('Genre', secondary=artist_genre,
+                                    order_by=Genre.name)
+    # genre names, assignable as a list of strings
+    genres = association_proxy('genre_objects', 'name', creator=Genre.named)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
@@ -41,31 +138,94 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.String(120))
+    # bumped on every write; drives API ETags and Last-Modified
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now())
+    # show counters read by the listings, maintained by counters.py
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                     server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0,
+                                 server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+
+    # weighted name/city/genres document maintained by triggers, see
+    # search.py
+    search_vector = db.deferred(db.Column(SearchVector))
 
     # create one to many relationship with shows table, using foreign key
     venues = db.relationship('Venue', secondary='show')
     shows = db.relationship('Show', backref=('artists'))
 
+    __table_args__ = (
+        db.Index('ix_artist_search_vector', 'search_vector',
+                 postgresql_using='gin'),
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        # the listing pages by (name, id), optionally filtered by area
+        db.Index('ix_artist_name_id', 'name', 'id'),
+        db.Index('ix_artist_city_state', 'city', 'state'),
+    )
+
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
 
+# length of a show listed without an end time
+DEFAULT_SHOW_DURATION = timedelta(hours=2)
+
+
+def _default_end_time(context):
+    start_time = context.get_current_parameters().get('start_time')
+    return start_time + DEFAULT_SHOW_DURATION if start_time else None
+
+
+def _default_starts_at(context):
+    parameters = context.get_current_parameters()
+    if parameters.get('start_time') is None:
+        return None
+    return to_utc(parameters['start_time'],
+                  _venue_timezone(context.connection, parameters.get('venue_id')))
+
+
 class Show(db.Model):
     __tablename__ = 'show'
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime)
+    # shows of the same venue or artist may not overlap, see conflicts.py
+    end_time = db.Column(db.DateTime, default=_default_end_time)
+    # start_time in UTC, which tells past shows from upcoming ones at any
+    # venue's clock. derived on insert, core inserts included, and on ORM
+    # updates; bulk inserts set it themselves to spare the venue lookup
+    starts_at = db.Column(db.DateTime, default=_default_starts_at)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'artist.id'), nullable=False)
+    # bumped on every write; drives API ETags and Last-Modified
+    updated_at = db.Column(db.DateTime, nullable=False, index=True,
+                           default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now())
 
     venue = db.relationship('Venue', backref='venue', lazy=True)
     artist = db.relationship('Artist', backref='artist', lazy=True)
 
+    # bookings and calendars filter shows by venue or artist and a local
+    # start_time range; detail pages and counters split them by starts_at,
+    # and listings page through them by (starts_at, id)
+    __table_args__ = (
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_venue_id_starts_at', 'venue_id', 'starts_at'),
+        db.Index('ix_show_artist_id_starts_at', 'artist_id', 'starts_at'),
+        db.Index('ix_show_starts_at', 'starts_at', 'id'),
+        db.CheckConstraint('end_time > start_time', name='ck_show_end_after_start'),
+    )
+
     def show_artist(self):
         artists_for_the_show = {
             'artist_id': self.artist_id,
             'artist_name': self.artist.name,
             'artist_image_link': self.artist.image_link,
-            'start_time': self.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            'start_time': self.start_time
         }
         return artists_for_the_show
 
@@ -74,6 +234,163 @@ class Show(db.Model):
             'venue_id': self.venue_id,
             'venue_name': self.venue.name,
             'venue_image_link': self.venue.image_link,
-            'start_time': self.start_time.strftime('%Y-%m-%d %H:%M:%S')
+            'venue_timezone': self.venue.timezone,
+            'start_time': self.start_time
         }
         return venues_for_the_show
+
+    def show_listing(self):
+        show_listing = {
+            'venue_id': self.venue_id,
+            'venue_name': self.venue.name,
+            'artist_id': self.artist_id,
+            'artist_name': self.artist.name,
+            'artist_image_link': self.artist.image_link,
+            'start_time': str(self.start_time),
+            'end_time': str(self.end_time)
+        }
+        return show_listing
+
+
+#----------------------------------------------------------------------------#
+# Venue geohashes.
+#----------------------------------------------------------------------------#
+
+
+@event.listens_for(Venue, 'before_update')
+def _update_geohash(mapper, connection, target):
+    # moved venues move cell; core updates set geohash themselves
+    target.geohash = encode_geohash(target.latitude, target.longitude)
+
+
+#----------------------------------------------------------------------------#
+# Show start times in UTC.
+#----------------------------------------------------------------------------#
+
+
+def _venue_timezone(connection, venue_id):
+    return connection.execute(db.select(Venue.timezone).where(
+        Venue.id == venue_id)).scalar()
+
+
+@event.listens_for(Show, 'before_update')
+def _update_starts_at(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.start_time.history.has_changes() or \
+            state.attrs.venue_id.history.has_changes():
+        target.starts_at = to_utc(target.start_time,
+                                  _venue_timezone(connection, target.venue_id))
+
+
+@event.listens_for(Venue, 'after_update')
+def _update_venue_starts_at(mapper, connection, target):
+    # a venue moved to another timezone moves all of its shows in UTC
+    if not db.inspect(target).attrs.timezone.history.has_changes():
+        return
+    shows = connection.execute(db.select(Show.id, Show.start_time).where(
+        Show.venue_id == target.id, Show.start_time.isnot(None))).all()
+    if shows:
+        connection.execute(
+            Show.__table__.update().where(Show.id == db.bindparam('show_id')).values(
+                starts_at=db.bindparam('utc')),
+            [{'show_id': show_id, 'utc': to_utc(start_time, target.timezone)}
+             for show_id, start_time in shows])
+
+
+#----------------------------------------------------------------------------#
+# Genre bookkeeping.
+#----------------------------------------------------------------------------#
+
+
+@event.listens_for(db.session, 'before_flush')
+def _genres_changed(session, flush_context, instances):
+    # genres are part of the API's row versions, but changing them only
+    # writes to the association table. reassigning the same genres is not
+    # a change.
+    for target in session.dirty:
+        if isinstance(target, (Venue, Artist)):
+            if db.inspect(target).attrs.genre_objects.history.has_changes():
+                target.updated_at = datetime.utcnow()
+
+
+@event.listens_for(Genre.__table__, 'after_create')
+def _seed_genres(target, connection, **kw):
+    connection.execute(target.insert(), [{'name': name} for name in GENRES])
+
+
+#----------------------------------------------------------------------------#
+# Search vector maintenance for databases built with db.create_all().
+# Mirrors migrations/versions/b4d7e2a9c613_genre_table.py.
+#----------------------------------------------------------------------------#
+
+# the genre weight is read from the association table, whose trigger
+# touches the owner row whenever a link is added or removed
+
+search_vector_function = DDL("""
+    CREATE OR REPLACE FUNCTION %(table)s_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.city, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(genre.name, ' ') FROM %(table)s_genre
+                JOIN genre ON genre.id = %(table)s_genre.genre_id
+                WHERE %(table)s_genre.%(table)s_id = NEW.id), '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+""")
+
+genre_link_function = """
+    CREATE OR REPLACE FUNCTION %(table)s_changed() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            UPDATE {owner} SET name = name WHERE id = OLD.{owner}_id;
+        ELSE
+            UPDATE {owner} SET name = name WHERE id = NEW.{owner}_id;
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+for table in (Venue.__table__, Artist.__table__):
+    event.listen(table, 'before_create', DDL(
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm').execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create',
+                 search_vector_function.execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create', DDL("""
+        CREATE TRIGGER %(table)s_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, city ON %(table)s
+        FOR EACH ROW EXECUTE PROCEDURE %(table)s_search_vector_update()
+    """).execute_if(dialect='postgresql'))
+
+for owner, table in (('venue', venue_genre), ('artist', artist_genre)):
+    event.listen(table, 'after_create', DDL(
+        genre_link_function.format(owner=owner)).execute_if(dialect='postgresql'))
+    event.listen(table, 'after_create', DDL("""
+        CREATE TRIGGER %(table)s_trigger
+        AFTER INSERT OR DELETE ON %(table)s
+        FOR EACH ROW EXECUTE PROCEDURE %(table)s_changed()
+    """).execute_if(dialect='postgresql'))
+
+
+#----------------------------------------------------------------------------#
+# Booking constraints for databases built with db.create_all().
+# Mirrors migrations/versions/d1c8f5b3a274_show_end_time.py.
+#----------------------------------------------------------------------------#
+
+# a GiST exclusion constraint per owner rejects any show whose
+# [start_time, end_time) range overlaps another show of the same venue or
+# artist. the columns are timestamps without time zone, hence tsrange.
+# btree_gist provides the integer equality operator class.
+
+event.listen(Show.__table__, 'before_create', DDL(
+    'CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+
+for owner in ('venue', 'artist'):
+    event.listen(Show.__table__, 'after_create', DDL("""
+        ALTER TABLE show ADD CONSTRAINT ex_show_{0}_overlap
+        EXCLUDE USING gist ({0}_id WITH =, tsrange(start_time, end_time) WITH &&)
+        WHERE (start_time IS NOT NULL AND end_time IS NOT NULL)
+    """.format(owner)).execute_if(dialect='postgresql'))
@@ -0,0 +1,162 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import abort, current_app, request
+from sqlalchemy import tuple_
+
+from extensions import reads
+
+#----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+#----------------------------------------------------------------------------#
+
+# pages are addressed by the sort key of a boundary row instead of an
+# OFFSET, so fetching page 10,000 costs the same index range scan as page 1.
+# every ordering ends with the primary key, which makes it total and stable
+# even when many rows share a name or a start time.
+# key columns must be NOT NULL: a row compared with a NULL key is neither
+# before nor after the cursor, so it would drop out of every later page.
+
+
+class Page(object):
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value, column):
+    # value as stored by _encode_value, checked against the type of the
+    # column it is compared with
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime:
+        if not isinstance(value, dict) or not isinstance(value.get('dt'), str):
+            raise ValueError('malformed cursor')
+        return datetime.fromisoformat(value['dt'])
+    if not isinstance(value, python_type) or isinstance(value, bool):
+        raise ValueError('malformed cursor')
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_encode_value(value) for value in values])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, columns):
+    # returns the key values stored in cursor, or raises ValueError if the
+    # cursor was not produced by encode_cursor for a key of these columns
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('malformed cursor')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('malformed cursor')
+    return tuple(_decode_value(value, column) for value, column in zip(values, columns))
+
+
+def _row_key(row, columns):
+    return tuple(getattr(row, column.key) for column in columns)
+
+
+def _keyset_query(query, columns, cursor, direction, limit):
+    # query (a Query or a select) narrowed to the rows after, or for
+    # direction 'prev' before, the cursor's row, in page order, with one
+    # extra row to learn whether there is another page
+    key = tuple_(*columns)
+    if direction == 'prev':
+        order_by = [column.desc() for column in columns]
+    else:
+        order_by = [column.asc() for column in columns]
+
+    if cursor is not None:
+        values = decode_cursor(cursor, columns)
+        if direction == 'prev':
+            query = query.filter(key < tuple_(*values))
+        else:
+            query = query.filter(key > tuple_(*values))
+
+    return query.order_by(*order_by).limit(limit + 1)
+
+
+def _keyset_result(rows, columns, cursor, direction, limit):
+    # the Page for the rows fetched by _keyset_query
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == 'prev':
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if has_more or direction == 'prev':
+            next_cursor = encode_cursor(_row_key(rows[-1], columns))
+        if cursor is not None and (has_more or direction == 'next'):
+            prev_cursor = encode_cursor(_row_key(rows[0], columns))
+
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def keyset_page(query, columns, cursor=None, direction='next', limit=50):
+    # fetch one page of query ordered by columns, starting after (or, for
+    # direction 'prev', before) the row the cursor points at
+    rows = _keyset_query(query, columns, cursor, direction, limit).all()
+    return _keyset_result(rows, columns, cursor, direction, limit)
+
+
+async def gather_keyset_page(statement, columns, cursor=None, direction='next', limit=50):
+    # keyset_page for a select, read on the async engine (see aio.py). the
+    # items are plain rows rather than model instances.
+    rows = await reads.fetch(_keyset_query(statement, columns, cursor, direction, limit))
+    return _keyset_result(list(rows), columns, cursor, direction, limit)
+
+
+def page_args():
+    # read cursor, dir and limit from the query string, clamping the page
+    # size to MAX_PAGE_SIZE
+    cursor = request.args.get('cursor') or None
+    direction = request.args.get('dir', 'next')
+    if direction not in ('next', 'prev'):
+        abort(400)
+
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    return cursor, direction, limit
+
+
+def paginate(query, columns):
+    # keyset_page driven by the current request's query string
+    cursor, direction, limit = page_args()
+    try:
+        return keyset_page(query, columns, cursor=cursor,
+                           direction=direction, limit=limit)
+    except ValueError:
+        abort(400)
+
+
+def load_page(query, columns):
+    # paginate, read on the async engine when ASYNC_READS is on. only for
+    # listings that use nothing but the columns of their rows.
+    if not reads.enabled:
+        return paginate(query, columns)
+    cursor, direction, limit = page_args()
+    try:
+        return reads.run(gather_keyset_page(query.statement, columns, cursor=cursor,
+                                            direction=direction, limit=limit))
+    except ValueError:
+        abort(400)
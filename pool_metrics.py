@@ -0,0 +1,126 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+#----------------------------------------------------------------------------#
+# Connection pool instrumentation.
+#----------------------------------------------------------------------------#
+
+# two latencies matter when sizing a pool: how long a request waits for a
+# connection (checkout wait; grows when the pool is too small) and how long
+# it keeps one (hold time; pool_size / hold time bounds throughput).
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.count = 0
+            self.sum = 0.0
+            self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def snapshot(self):
+        # cumulative counts per upper bound, prometheus style
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+                cumulative += count
+                buckets.append({'le': bound, 'count': cumulative})
+            return {
+                'count': self.count,
+                'sum': self.sum,
+                'max': self.max,
+                'mean': self.sum / self.count if self.count else None,
+                'buckets': buckets,
+            }
+
+
+class PoolMetrics(object):
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.hold_time = Histogram()
+        self.timeouts = 0
+        self.connects = 0
+
+
+# one set of metrics per process; a pool recreated by engine.dispose()
+# keeps reporting into it
+metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super(InstrumentedQueuePool, self)._do_get()
+        except exc.TimeoutError:
+            metrics.timeouts += 1
+            raise
+        finally:
+            metrics.checkout_wait.observe(time.perf_counter() - start)
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    metrics.connects += 1
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop('checked_out_at', None)
+    if checked_out_at is not None:
+        metrics.hold_time.observe(time.perf_counter() - checked_out_at)
+
+
+def configure(app):
+    # use the instrumented pool for the app's engine; call before
+    # db.init_app so the engine is built with it
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if 'pool_size' in options:
+        options.setdefault('poolclass', InstrumentedQueuePool)
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {
+        'pool': type(pool).__name__,
+        'connects': metrics.connects,
+        'timeouts': metrics.timeouts,
+        'checkout_wait': metrics.checkout_wait.snapshot(),
+        'hold_time': metrics.hold_time.snapshot(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'max_overflow': pool._max_overflow,
+            'timeout': pool.timeout(),
+        })
+    return status
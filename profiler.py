@@ -0,0 +1,101 @@
+import json
+import logging
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL profiler.
+#----------------------------------------------------------------------------#
+
+# when SQL_PROFILER_ENABLED is set, every statement run while handling a
+# request is timed. the response gets a Server-Timing header with the
+# query count and total database time, statements slower than
+# SLOW_QUERY_MS are logged, and statements run more than once in the same
+# request are logged as duplicates, which is how N+1 loops show up. when
+# the setting is off nothing is registered at all.
+
+logger = logging.getLogger('fyyur.sql')
+
+
+class RequestProfile(object):
+    def __init__(self, slow_seconds):
+        self.slow_seconds = slow_seconds
+        self.count = 0
+        self.total = 0.0
+        self.slow = []
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total += duration
+        self.statements[statement] += 1
+        if duration >= self.slow_seconds:
+            self.slow.append((duration, self.count, statement))
+
+    def duplicates(self):
+        return {statement: count for statement, count
+                in self.statements.items() if count > 1}
+
+    def server_timing(self):
+        return 'db;dur={:.2f};desc="{} queries, {} duplicated"'.format(
+            self.total * 1000, self.count, len(self.duplicates()))
+
+
+def _log(event_name, **fields):
+    fields['event'] = event_name
+    logger.warning(json.dumps(fields, default=str))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_profile' in g:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'sql_profile' in g:
+        starts = conn.info.get('query_start')
+        if starts:
+            duration = time.perf_counter() - starts.pop()
+            g.sql_profile.record(statement, duration)
+
+
+def init_app(app):
+    if not app.config.get('SQL_PROFILER_ENABLED'):
+        return
+
+    slow_query_ms = app.config.get('SLOW_QUERY_MS', 100)
+
+    if app.config.get('SLOW_QUERY_LOG'):
+        handler = logging.FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_profile():
+        g.sql_profile = RequestProfile(slow_query_ms / 1000)
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+
+        response.headers.add('Server-Timing', profile.server_timing())
+
+        for duration, _, statement in sorted(profile.slow, reverse=True):
+            _log('slow_query', method=request.method, path=request.path,
+                 duration_ms=round(duration * 1000, 2), statement=statement)
+
+        for statement, count in profile.duplicates().items():
+            _log('duplicate_query', method=request.method, path=request.path,
+                 count=count, statement=statement)
+
+        return response
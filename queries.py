@@ -0,0 +1,399 @@
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload, selectinload, subqueryload, lazyload
+
+from extensions import db, cache, queue, reads
+from models import Venue, Artist, Show, Genre
+
+#----------------------------------------------------------------------------#
+# Relationship loading.
+#----------------------------------------------------------------------------#
+
+# loader strategies a call site can pick from when it knows which
+# relationships it is going to touch
+LOADER_STRATEGIES = {
+    'joined': joinedload,
+    'selectin': selectinload,
+    'subquery': subqueryload,
+    'lazy': lazyload,
+}
+
+
+def with_relationships(query, *relationships, strategy='joined'):
+    # attach a loader option for each relationship so accessing it later
+    # does not fire one SELECT per row
+    loader = LOADER_STRATEGIES[strategy]
+    return query.options(*[loader(relationship) for relationship in relationships])
+
+
+def split_shows(shows, now=None):
+    # split shows into past and upcoming against a single UTC timestamp
+    now = now or datetime.utcnow()
+    past_shows = []
+    upcoming_shows = []
+    for show in shows:
+        if show.starts_at > now:
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+    return past_shows, upcoming_shows
+
+
+def shows_query(criterion, relationship, strategy='joined'):
+    # every show matching criterion, with the given relationship loaded up
+    # front, in start time order
+    return with_relationships(
+        Show.query.filter(criterion, Show.starts_at.isnot(None)),
+        relationship, strategy=strategy
+    ).order_by(Show.starts_at, Show.id)
+
+
+def load_shows(criterion, relationship, strategy='joined', now=None):
+    # fetch every show matching criterion in one query and split them into
+    # past and upcoming
+    shows = shows_query(criterion, relationship, strategy=strategy).all()
+    return split_shows(shows, now)
+
+#----------------------------------------------------------------------------#
+# Read queries shared by the views.
+#----------------------------------------------------------------------------#
+
+
+def venue_listing_query():
+    # one row per venue with its area and number of upcoming shows, read
+    # from the venue's own counters (see counters.py) without touching show
+    return db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    )
+
+
+def filter_listing(query, model, args):
+    # narrow a venue or artist listing by the genre, city and state in args
+    # (e.g. request.args). the genre filter is a semi-join served by the
+    # (genre_id, owner id) index, the area by (city, state).
+    if args.get('genre'):
+        query = query.filter(model.genre_objects.any(Genre.name == args['genre']))
+    if args.get('city'):
+        query = query.filter(model.city == args['city'])
+    if args.get('state'):
+        query = query.filter(model.state == args['state'])
+    return query
+
+
+def group_by_area(rows):
+    # build the area -> venues tree used by pages/venues.html
+    areas = {}
+    for row in rows:
+        area = areas.setdefault((row.city or '', row.state or ''), {
+            'city': row.city,
+            'state': row.state,
+            'venues': []
+        })
+        area['venues'].append({
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        })
+
+    return [areas[key] for key in sorted(areas)]
+
+
+def venue_detail(venue_id, strategy='joined', now=None):
+    # assemble the data dict rendered by pages/show_venue.html, or None if
+    # the venue does not exist
+    venue = Venue.query.options(joinedload(Venue.genre_objects)).get(venue_id)
+    if venue is None:
+        return None
+
+    past_shows, upcoming_shows = load_shows(
+        Show.venue_id == venue_id, Show.artist, strategy=strategy, now=now)
+    past_shows = [show.show_artist() for show in past_shows]
+    upcoming_shows = [show.show_artist() for show in upcoming_shows]
+
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": list(venue.genres),
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "timezone": venue.timezone,
+        "upcoming_shows": upcoming_shows,
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows),
+        "upcoming_shows_count": len(upcoming_shows)
+    }
+
+
+def artist_detail(artist_id, strategy='joined', now=None):
+    # assemble the data dict rendered by pages/show_artist.html, or None if
+    # the artist does not exist
+    artist = Artist.query.options(joinedload(Artist.genre_objects)).get(artist_id)
+    if artist is None:
+        return None
+
+    past_shows, upcoming_shows = load_shows(
+        Show.artist_id == artist_id, Show.venue, strategy=strategy, now=now)
+    past_shows = [show.show_venue() for show in past_shows]
+    upcoming_shows = [show.show_venue() for show in upcoming_shows]
+
+    return {
+        'id': artist.id,
+        'name': artist.name,
+        'genres': list(artist.genres),
+        'city': artist.city,
+        'state': artist.state,
+        'phone': artist.phone,
+        'website': artist.website,
+        'facebook_link': artist.facebook_link,
+        'seeking_venue': artist.seeking_venue,
+        'seeking_description': artist.seeking_description,
+        'image_link': artist.image_link,
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows)
+    }
+
+
+#----------------------------------------------------------------------------#
+# Concurrent detail reads.
+#----------------------------------------------------------------------------#
+
+# the same dicts as venue_detail and artist_detail, from four queries run
+# at once on the async engine (see aio.py): the row, its genres, its
+# upcoming shows and its past shows
+
+VENUE_FIELDS = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone',
+                'website', 'facebook_link', 'seeking_talent',
+                'seeking_description', 'image_link', 'timezone')
+ARTIST_FIELDS = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website',
+                 'facebook_link', 'seeking_venue', 'seeking_description',
+                 'image_link')
+
+# the show dicts built by Show.show_artist and Show.show_venue
+VENUE_SHOW_COLUMNS = (Show.artist_id, Artist.name.label('artist_name'),
+                      Artist.image_link.label('artist_image_link'), Show.start_time)
+ARTIST_SHOW_COLUMNS = (Show.venue_id, Venue.name.label('venue_name'),
+                       Venue.image_link.label('venue_image_link'),
+                       Venue.timezone.label('venue_timezone'), Show.start_time)
+
+
+async def _gather_detail(model, owner_id, fields, other, show_columns, now):
+    owner_key = getattr(Show, '{}_id'.format(model.__tablename__))
+    other_key = getattr(Show, '{}_id'.format(other.__tablename__))
+    link = model.genre_objects.property.secondary
+
+    owner = db.select(*[getattr(model, field) for field in fields if field != 'genres']
+                      ).where(model.id == owner_id)
+    genres = db.select(Genre.name).join(link, link.c.genre_id == Genre.id).where(
+        link.c['{}_id'.format(model.__tablename__)] == owner_id).order_by(Genre.name)
+    shows = db.select(*show_columns).join_from(Show, other, other.id == other_key).where(
+        owner_key == owner_id).order_by(Show.starts_at, Show.id)
+
+    owner, genres, upcoming_shows, past_shows = await reads.gather(
+        owner, genres, shows.where(Show.starts_at > now), shows.where(Show.starts_at <= now))
+    if not owner:
+        return None
+
+    owner = owner[0]._mapping
+    genres = [name for name, in genres]
+    past_shows = [dict(show._mapping) for show in past_shows]
+    upcoming_shows = [dict(show._mapping) for show in upcoming_shows]
+
+    data = {field: genres if field == 'genres' else owner[field] for field in fields}
+    data.update({
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows)
+    })
+    return data
+
+
+async def gather_venue_detail(venue_id, now=None):
+    return await _gather_detail(Venue, venue_id, VENUE_FIELDS, Artist,
+                                VENUE_SHOW_COLUMNS, now or datetime.utcnow())
+
+
+async def gather_artist_detail(artist_id, now=None):
+    return await _gather_detail(Artist, artist_id, ARTIST_FIELDS, Venue,
+                                ARTIST_SHOW_COLUMNS, now or datetime.utcnow())
+
+
+def load_venue_detail(venue_id, now=None):
+    # venue_detail, read concurrently when ASYNC_READS is on
+    if reads.enabled:
+        return reads.run(gather_venue_detail(venue_id, now))
+    return venue_detail(venue_id, now=now)
+
+
+def load_artist_detail(artist_id, now=None):
+    # artist_detail, read concurrently when ASYNC_READS is on
+    if reads.enabled:
+        return reads.run(gather_artist_detail(artist_id, now))
+    return artist_detail(artist_id, now=now)
+
+
+#----------------------------------------------------------------------------#
+# Cached lookups.
+#----------------------------------------------------------------------------#
+
+GENRES_KEY = 'genres'
+
+
+def genre_choices():
+    # (value, label) pairs for the genre fields of the venue and artist
+    # forms; genres rarely change, so they are cached rather than queried
+    # for every form
+    return cache.get_or_set(GENRES_KEY, lambda: [
+        (name, name) for name, in db.session.query(Genre.name).order_by(Genre.name)])
+
+
+#----------------------------------------------------------------------------#
+# Cached detail pages.
+#----------------------------------------------------------------------------#
+
+# a write drops the pages it changed once it has committed, before
+# responding, so the page it redirects to is fresh. a key delete is cheap;
+# the fan-out to the pages of every venue or artist the row appears on,
+# which first has to find them, is registered as a background task and
+# enqueued instead.
+
+
+def venue_key(venue_id):
+    return 'venue:{}'.format(venue_id)
+
+
+def artist_key(artist_id):
+    return 'artist:{}'.format(artist_id)
+
+
+def cached_venue_detail(venue_id):
+    return cache.get_or_set(venue_key(venue_id), lambda: load_venue_detail(venue_id))
+
+
+def cached_artist_detail(artist_id):
+    return cache.get_or_set(artist_key(artist_id), lambda: load_artist_detail(artist_id))
+
+
+def invalidate_show(venue_id, artist_id):
+    # a show appears on both its venue's and its artist's page
+    cache.invalidate(venue_key(venue_id), artist_key(artist_id))
+
+
+def invalidate_venue(venue_id):
+    cache.invalidate(venue_key(venue_id))
+
+
+def invalidate_artist(artist_id):
+    cache.invalidate(artist_key(artist_id))
+
+
+@queue.task
+def invalidate_venue_artists(venue_id, artist_ids=None):
+    # the venue's name and image also appear on the page of every artist
+    # that has played there. artist_ids is passed once those shows are
+    # gone, after the venue was deleted.
+    if artist_ids is None:
+        artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter(
+            Show.venue_id == venue_id).distinct()]
+    cache.invalidate(*[artist_key(artist_id) for artist_id in artist_ids])
+
+
+@queue.task
+def invalidate_artist_venues(artist_id):
+    # the artist's name and image also appear on the page of every venue
+    # it has played at
+    venue_ids = db.session.query(Show.venue_id).filter(
+        Show.artist_id == artist_id).distinct()
+    cache.invalidate(*[venue_key(venue_id) for venue_id, in venue_ids])
+
+
+#----------------------------------------------------------------------------#
+# Row versions.
+#----------------------------------------------------------------------------#
+
+# cheap, index-backed fingerprints of everything a response depends on.
+# the API compares them with the client's ETag before assembling any data.
+# a detail page also depends on the clock: it changes when its next
+# upcoming show becomes a past one, so that boundary (in UTC, like now) is
+# part of the version.
+
+
+def venue_version(venue_id, now=None):
+    # (fingerprint, last modified) of a venue's detail data, or None if the
+    # venue does not exist
+    now = now or datetime.utcnow()
+    venue_updated_at = db.session.query(Venue.updated_at).filter(
+        Venue.id == venue_id).scalar()
+    if venue_updated_at is None:
+        return None
+
+    shows = db.session.query(
+        db.func.count(Show.id),
+        db.func.max(Show.updated_at),
+        db.func.max(Artist.updated_at),
+        db.func.min(Show.starts_at).filter(Show.starts_at > now),
+        db.func.max(Show.starts_at).filter(Show.starts_at <= now)
+    ).join(Artist, Show.artist_id == Artist.id).filter(
+        Show.venue_id == venue_id).one()
+
+    # the page also changes when its latest show moves from upcoming to past
+    last_modified = max(filter(None, (venue_updated_at, shows[1], shows[2], shows[4])))
+    return ('venue', venue_id, venue_updated_at) + tuple(shows), last_modified
+
+
+def artist_version(artist_id, now=None):
+    # (fingerprint, last modified) of an artist's detail data, or None if
+    # the artist does not exist
+    now = now or datetime.utcnow()
+    artist_updated_at = db.session.query(Artist.updated_at).filter(
+        Artist.id == artist_id).scalar()
+    if artist_updated_at is None:
+        return None
+
+    shows = db.session.query(
+        db.func.count(Show.id),
+        db.func.max(Show.updated_at),
+        db.func.max(Venue.updated_at),
+        db.func.min(Show.starts_at).filter(Show.starts_at > now),
+        db.func.max(Show.starts_at).filter(Show.starts_at <= now)
+    ).join(Venue, Show.venue_id == Venue.id).filter(
+        Show.artist_id == artist_id).one()
+
+    # the page also changes when its latest show moves from upcoming to past
+    last_modified = max(filter(None, (artist_updated_at, shows[1], shows[2], shows[4])))
+    return ('artist', artist_id, artist_updated_at) + tuple(shows), last_modified
+
+
+def listing_version(*models, now=None):
+    # (fingerprint, last modified) of listings built from models: the row
+    # count, which catches deletions, and the latest updated_at, which
+    # catches inserts and updates. pass now for listings that split shows
+    # into past and upcoming.
+    version = []
+    for model in models:
+        version.extend(db.session.query(
+            db.func.count(model.id), db.func.max(model.updated_at)).one())
+    last_modified = max(filter(None, version[1::2]), default=None)
+
+    if now is not None:
+        next_show, last_show = db.session.query(
+            db.func.min(Show.starts_at).filter(Show.starts_at > now),
+            db.func.max(Show.starts_at).filter(Show.starts_at <= now)).one()
+        version.append(next_show)
+        # when the latest show moved from upcoming to past
+        last_modified = max(filter(None, (last_modified, last_show)), default=None)
+
+    return tuple(version), last_modified
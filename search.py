@@ -0,0 +1,82 @@
+import re
+
+from flask import current_app
+
+from extensions import db
+from queries import filter_listing
+
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#----------------------------------------------------------------------------#
+
+# search runs in two stages on PostgreSQL:
+#   1. a prefix full-text match against search_vector (name, city and
+#      genres, weighted in that order) served by its GIN index and ranked
+#      with ts_rank_cd
+#   2. if that finds nothing, a pg_trgm fuzzy/substring match on the name
+#      served by the gin_trgm_ops index, ranked by similarity
+# other databases fall back to a plain case-insensitive substring match.
+# either way results can be narrowed by genre and area like the listings.
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def prefix_tsquery(term):
+    # turn free text into a tsquery string matching every word as a
+    # prefix, e.g. "musical ho" -> "musical:* & ho:*"; returns None when
+    # the term has no searchable words
+    tokens = TOKEN_RE.findall(term.lower())
+    if not tokens:
+        return None
+    return ' & '.join(token + ':*' for token in tokens)
+
+
+def _contains(term):
+    # ILIKE pattern matching term anywhere, with LIKE wildcards escaped
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _full_text(model, query, term, limit):
+    tsquery = prefix_tsquery(term)
+    if tsquery is None:
+        return []
+
+    tsquery = db.func.to_tsquery('simple', tsquery)
+    rank = db.func.ts_rank_cd(model.search_vector, tsquery)
+    return query.filter(model.search_vector.op('@@')(tsquery)).order_by(
+        rank.desc(), model.name, model.id).limit(limit).all()
+
+
+def _trigram(model, query, term, limit):
+    similarity = db.func.similarity(model.name, term)
+    return query.filter(db.or_(
+        model.name.ilike(_contains(term), escape='\\'),
+        model.name.op('%')(term)
+    )).order_by(similarity.desc(), model.name, model.id).limit(limit).all()
+
+
+def _substring(model, query, term, limit):
+    return query.filter(model.name.ilike(_contains(term), escape='\\')).order_by(
+        model.name, model.id).limit(limit).all()
+
+
+def search(model, term, limit=None, filters=None):
+    # returns the {'count', 'data'} dict rendered by the search templates.
+    # filters may hold a genre, city and state, as for filter_listing.
+    limit = limit or current_app.config['SEARCH_LIMIT']
+    term = term.strip()
+    query = filter_listing(model.query, model, filters or {})
+
+    if not term:
+        results = query.order_by(model.name, model.id).limit(limit).all()
+    elif db.session.get_bind().dialect.name == 'postgresql':
+        results = (_full_text(model, query, term, limit) or
+                   _trigram(model, query, term, limit))
+    else:
+        results = _substring(model, query, term, limit)
+
+    return {
+        'count': len(results),
+        'data': [{'id': result.id, 'name': result.name} for result in results]
+    }
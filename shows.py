@@ -0,0 +1,80 @@
+from flask import Blueprint, render_template, request, flash
+from sqlalchemy.exc import IntegrityError
+
+from conflicts import find_conflicts
+from extensions import db
+from feed import feed_query
+from models import Show, DEFAULT_SHOW_DURATION
+from pagination import load_page
+from queries import invalidate_show
+
+#----------------------------------------------------------------------------#
+# Show pages.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('shows', __name__)
+
+
+@blueprint.route('/shows')
+def shows():
+    # one page of shows ordered by start time, optionally for one ?city=
+    # and ?state=, read from the denormalized show feed
+    query, key = feed_query(city=request.args.get('city'),
+                            state=request.args.get('state'))
+    page = load_page(query, key)
+    return render_template('pages/shows.html', shows=page.items, page=page)
+
+
+@blueprint.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    from forms import ShowForm
+    form = ShowForm()
+    if form.validate_on_submit():
+        try:
+            artist_id = int(form.artist_id.data)
+            venue_id = int(form.venue_id.data)
+            start_time = form.start_time.data
+            end_time = form.end_time.data or start_time + DEFAULT_SHOW_DURATION
+
+            # refuse double bookings with the reasons; on postgres the
+            # exclusion constraints still catch a concurrent booking
+            reasons = find_conflicts(venue_id, artist_id, start_time, end_time)
+            if reasons:
+                for reason in reasons:
+                    flash(reason)
+                return render_template('forms/new_show.html', form=form), 409
+
+            show = Show(artist_id=artist_id, venue_id=venue_id,
+                        start_time=start_time, end_time=end_time)
+            db.session.add(show)
+            db.session.commit()
+            invalidate_show(venue_id, artist_id)
+
+        # on successful db insert, flash success
+            flash('Show was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+        except IntegrityError:
+            db.session.rollback()
+            reasons = find_conflicts(venue_id, artist_id, start_time, end_time)
+            for reason in reasons or ['Show could not be listed! Please double check the information.']:
+                flash(reason)
+            return render_template('forms/new_show.html', form=form), 409 if reasons else 400
+        except:
+            db.session.rollback()
+            flash('Show could not be listed! Please double check the information.')
+            return render_template('forms/new_show.html', form=form), 400
+    else:
+        flash('An error occurred. Show could not be listed.')
+    # e.g., flash('An error occurred. Show could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
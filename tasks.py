@@ -0,0 +1,262 @@
+import logging
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import g, has_request_context
+
+#----------------------------------------------------------------------------#
+# Background jobs.
+#----------------------------------------------------------------------------#
+
+# work that does not have to finish before the response (side effects of a
+# write, such as dropping the cached pages of every row it appears on) is
+# enqueued as a job and run by a broker off the request thread. a failed
+# job is retried with exponential backoff up to its retry limit. a job
+# enqueued with an idempotency key that is already known returns the
+# existing job instead of running twice. job status is kept in process,
+# bounded to the most recent TASK_RETENTION jobs, and served by
+# /jobs/<job_id> to holders of INTERNAL_TOKEN; responses name the jobs
+# their request enqueued in an X-Job-Id header.
+
+logger = logging.getLogger('fyyur.tasks')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+RETRYING = 'retrying'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED = (SUCCEEDED, FAILED)
+
+
+class Job(object):
+    def __init__(self, name, args, kwargs, max_retries, idempotency_key=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.max_retries = max_retries
+        self.idempotency_key = idempotency_key
+        self.status = QUEUED
+        self.attempts = 0
+        self.error = None
+        self.enqueued_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_retries': self.max_retries,
+            'idempotency_key': self.idempotency_key,
+            'error': self.error,
+            'enqueued_at': self.enqueued_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobStore(object):
+    # jobs by id and by idempotency key. once over max_jobs the oldest
+    # finished jobs are dropped; unfinished ones are always kept.
+    def __init__(self, max_jobs=10000):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def add(self, job):
+        # store job and return (job, True), or (existing job, False) if its
+        # idempotency key is taken
+        with self._lock:
+            if job.idempotency_key is not None:
+                existing = self._keys.get(job.idempotency_key)
+                if existing is not None:
+                    return self._jobs[existing], False
+                self._keys[job.idempotency_key] = job.id
+            self._jobs[job.id] = job
+            self._prune()
+        return job, True
+
+    def _prune(self):
+        excess = len(self._jobs) - self.max_jobs
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.status in FINISHED][:excess]:
+            job = self._jobs.pop(job_id)
+            if job.idempotency_key is not None:
+                self._keys.pop(job.idempotency_key, None)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def counts(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+
+class Broker(ABC):
+    # delivers published jobs to the worker callable given to start(). a
+    # broker backed by an external queue implements the same methods.
+    def start(self, worker):
+        self.worker = worker
+
+    @abstractmethod
+    def publish(self, job, delay=0):
+        pass
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class ThreadPoolBroker(Broker):
+    # runs jobs on a pool of threads in this process. the pool is created on
+    # first use, so a process forked after start() builds its own.
+    def __init__(self, workers=4):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _submit(self, job):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='fyyur-task')
+            executor = self._executor
+        executor.submit(self.worker, job)
+
+    def publish(self, job, delay=0):
+        if delay:
+            timer = threading.Timer(delay, self._submit, (job,))
+            timer.daemon = True
+            timer.start()
+        else:
+            self._submit(job)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+class FakeBroker(Broker):
+    # holds published jobs until run_pending() runs them on the calling
+    # thread, retry delays ignored; for tests and benchmarks
+    def __init__(self):
+        self.pending = deque()
+
+    def publish(self, job, delay=0):
+        self.pending.append(job)
+
+    def run_pending(self):
+        # run jobs, including retries they publish, until none are left;
+        # returns how many runs there were
+        runs = 0
+        while self.pending:
+            self.worker(self.pending.popleft())
+            runs += 1
+        return runs
+
+
+class TaskQueue(object):
+    def __init__(self, broker=None):
+        self.broker = broker or ThreadPoolBroker()
+        self.store = JobStore()
+        self.tasks = {}
+        self.max_retries = 3
+        self.retry_delay = 0.5
+        self.app = None
+
+    def init_app(self, app):
+        config = app.config
+        self.max_retries = config.get('TASK_MAX_RETRIES', 3)
+        self.retry_delay = config.get('TASK_RETRY_DELAY', 0.5)
+        self.store = JobStore(config.get('TASK_RETENTION', 10000))
+
+        backend = config.get('TASK_BACKEND', 'thread')
+        if backend == 'thread':
+            self.broker = ThreadPoolBroker(config.get('TASK_WORKERS', 4))
+        elif backend == 'fake':
+            self.broker = FakeBroker()
+        else:
+            raise ValueError('unknown TASK_BACKEND {!r}'.format(backend))
+
+        self.app = app
+        self.broker.start(self._run)
+        app.extensions['tasks'] = self
+
+        @app.after_request
+        def job_ids_header(response):
+            job_ids = g.pop('job_ids', None)
+            if job_ids:
+                response.headers['X-Job-Id'] = ', '.join(job_ids)
+            return response
+
+    def task(self, func=None, name=None, retries=None):
+        # register func as a task; it stays callable as before
+        def register(func):
+            func.task_name = name or '{}.{}'.format(func.__module__, func.__name__)
+            func.task_retries = retries
+            self.tasks[func.task_name] = func
+            return func
+        return register(func) if func is not None else register
+
+    def enqueue(self, task, *args, idempotency_key=None, **kwargs):
+        # run a registered task in the background; returns its Job
+        func = self.tasks[getattr(task, 'task_name', task)]
+        max_retries = func.task_retries
+        if max_retries is None:
+            max_retries = self.max_retries
+        job, created = self.store.add(Job(
+            func.task_name, args, kwargs, max_retries, idempotency_key))
+        if created:
+            self.broker.publish(job)
+        if has_request_context():
+            g.setdefault('job_ids', []).append(job.id)
+        return job
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def _run(self, job):
+        func = self.tasks[job.name]
+        job.status = RUNNING
+        job.attempts += 1
+        job.started_at = datetime.utcnow()
+        try:
+            with self.app.app_context():
+                func(*job.args, **job.kwargs)
+        except Exception as error:
+            job.error = '{}: {}'.format(type(error).__name__, error)
+            if job.attempts <= job.max_retries:
+                job.status = RETRYING
+                self.broker.publish(
+                    job, delay=self.retry_delay * 2 ** (job.attempts - 1))
+            else:
+                job.status = FAILED
+                job.finished_at = datetime.utcnow()
+                logger.exception('job %s (%s) failed after %d attempts',
+                                 job.id, job.name, job.attempts)
+        else:
+            job.status = SUCCEEDED
+            job.error = None
+            job.finished_at = datetime.utcnow()
+
+    def stats(self):
+        return {
+            'broker': type(self.broker).__name__,
+            'tasks': sorted(self.tasks),
+            'jobs': self.store.counts(),
+        }
@@ -0,0 +1,220 @@
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, jsonify
+
+from availability import calendar_feed
+from extensions import db, queue
+from formatting import is_timezone
+import geo
+from models import Venue, Show
+from pagination import load_page
+from queries import venue_listing_query, filter_listing, group_by_area, \
+    with_relationships, cached_venue_detail, invalidate_venue, invalidate_venue_artists
+from search import search
+
+#----------------------------------------------------------------------------#
+# Venue pages.
+#----------------------------------------------------------------------------#
+
+blueprint = Blueprint('venues', __name__)
+
+
+@blueprint.route('/venues')
+def venues():
+    # query one page of venues, ordered by name, grouped by city and state
+    # together with the number of upcoming shows for each venue
+    # optionally filtered by ?genre=, ?city= and ?state=
+    page = load_page(filter_listing(venue_listing_query(), Venue, request.args),
+                     (Venue.name, Venue.id))
+    data = group_by_area(page.items)
+
+    return render_template('pages/venues.html', areas=data, page=page)
+
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+    # search venues by name, city and genres, ranked by relevance
+    search_term = request.form.get('search_term', '')
+    # genre, city and state may narrow it, from the form or the query string
+    response = search(Venue, search_term, filters=request.values)
+
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@blueprint.route('/venues/near')
+def venues_near():
+    # venues within ?radius= km (default 10) of ?lat=&lng=, nearest first,
+    # with their upcoming show counts
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    radius = request.args.get('radius', 10.0, type=float)
+    limit = request.args.get('limit', 50, type=int)
+    if lat is None or lng is None or not -90 <= lat <= 90 or not -180 <= lng <= 180 \
+            or not 0 < radius <= geo.MAX_RADIUS_KM or not 0 < limit <= geo.MAX_RESULTS:
+        abort(400)
+
+    return jsonify({'data': geo.nearby(lat, lng, radius, limit=limit)})
+
+
+@blueprint.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id, loading all of its shows
+    # and their artists in a single query on a cache miss
+    data = cached_venue_detail(venue_id)
+
+    # check if the venue does not exist
+    if data is None:
+        return render_template('errors/404.html')
+
+    return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+# define the Genre class
+
+    # create one to many relationship with venue table
+
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    from forms import VenueForm
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+    from forms import VenueForm
+    form = VenueForm()
+    if form.validate_on_submit():
+        name = form.name.data
+        city = form.city.data
+        state = form.state.data
+        address = form.address.data
+        phone = form.phone.data
+        image_link = form.image_link.data
+        website_link = form.website_link.data
+        facebook_link = form.facebook_link.data
+        seeking_talent = form.seeking_talent.data
+        seeking_description = form.seeking_description.data
+        genres = form.genres.data
+        latitude = form.latitude.data
+        longitude = form.longitude.data
+        timezone = form.timezone.data
+
+        venue = Venue(name=name, city=city, address=address, phone=phone, state=state, facebook_link=facebook_link, image_link=image_link,
+                      website=website_link, seeking_talent=seeking_talent, genres=genres, seeking_description=seeking_description,
+                      latitude=latitude, longitude=longitude, timezone=timezone)
+        db.session.add(venue)
+        db.session.commit()
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    else:
+        flash('Error occured. Venue ' +
+              request.form['name'] + ' could not be listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+    return render_template('pages/home.html')
+
+
+@blueprint.route('/delete/<venue_id>', methods=['GET', 'DELETE'])
+def delete_venue(venue_id):
+    # TODO: Complete this endpoint for taking a venue_id, and using
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    venue_to_delete = Venue.query.get_or_404(venue_id)
+
+    artist_ids = [artist_id for artist_id, in db.session.query(Show.artist_id).filter(
+        Show.venue_id == venue_to_delete.id).distinct()]
+
+    try:
+        db.session.delete(venue_to_delete)
+        db.session.commit()
+        invalidate_venue(venue_to_delete.id)
+        queue.enqueue(invalidate_venue_artists, venue_to_delete.id, artist_ids,
+                      idempotency_key='venue-deleted:{}'.format(venue_to_delete.id))
+        flash('Venue ' + venue_to_delete.name + ' was successfully deleted!')
+
+        return render_template('pages/home.html')
+    except:
+        db.session.rollback()
+        flash('An error occurred. Venue ' +
+              venue_to_delete.name + ' could not be deleted.')
+        return render_template('pages/show_venue.html', venue=venue_to_delete)
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+
+
+
+@blueprint.route('/venues/<int:venue_id>/calendar.ics')
+def venue_calendar(venue_id):
+    return calendar_feed(Venue, venue_id)
+
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+
+    venue_to_edit = with_relationships(
+        Venue.query, Venue.genre_objects).get_or_404(venue_id)
+    if request.method == 'GET':
+        form.name.data = venue_to_edit.name
+        form.city.data = venue_to_edit.city
+        form.state.data = venue_to_edit.state
+        # form.data.address = venue_to_edit.address
+        form.phone.data = venue_to_edit.phone
+        form.genres.data = venue_to_edit.genres
+        form.facebook_link.data = venue_to_edit.facebook_link
+        form.image_link.data = venue_to_edit.image_link
+        # form.seeking_talent.data = venue_to_edit.seeking_talent
+        form.seeking_description.data = venue_to_edit.seeking_description
+        form.latitude.data = venue_to_edit.latitude
+        form.longitude.data = venue_to_edit.longitude
+        form.timezone.data = venue_to_edit.timezone
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue_to_edit)
+
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET', 'POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    venue_to_edit = with_relationships(
+        Venue.query, Venue.genre_objects).get_or_404(venue_id)
+    from forms import VenueForm
+    form = VenueForm(Venue=venue_to_edit)
+
+    if request.method == 'POST':
+        venue_to_edit.name = form.name.data
+        venue_to_edit.city = form.city.data
+        venue_to_edit.state = form.state.data
+        venue_to_edit.address = form.address.data
+        venue_to_edit.phone = form.phone.data
+        venue_to_edit.genres = form.genres.data
+        venue_to_edit.facebook_link = form.facebook_link.data
+        venue_to_edit.image_link = form.image_link.data
+        venue_to_edit.seeking_talent = form.seeking_talent.data
+        venue_to_edit.seeking_description = form.seeking_description.data
+        venue_to_edit.latitude = form.latitude.data
+        venue_to_edit.longitude = form.longitude.data
+        if form.timezone.data is None or is_timezone(form.timezone.data):
+            venue_to_edit.timezone = form.timezone.data
+
+        try:
+            db.session.flush()
+            updated_at = venue_to_edit.updated_at
+            db.session.commit()
+            invalidate_venue(venue_id)
+            queue.enqueue(invalidate_venue_artists, venue_id,
+                          idempotency_key='venue-updated:{}:{}'.format(
+                              venue_id, updated_at.isoformat()))
+            flash('Venue ' + request.form['name'] +
+                  ' was successfully updated!')
+            return redirect(url_for('venues.show_venue', venue_id=venue_id))
+        except:
+            db.session.rollback()
+            flash('An error occurred. Venue could not be edited.')
+            return redirect(url_for('venues.edit_venue', venue_id=venue_id, form=form))
+    else:
+        return render_template('forms/edit_venue.html', form=form, venue=venue_to_edit)
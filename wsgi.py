@@ -0,0 +1,40 @@
+import gc
+import os
+
+from app import create_app
+from extensions import assets
+
+#----------------------------------------------------------------------------#
+# Production entry point.
+#----------------------------------------------------------------------------#
+
+# served by gunicorn with the settings in gunicorn.conf.py:
+#
+#     gunicorn wsgi:app
+#
+# the app is loaded once in the master (preload_app) and forked into the
+# workers, which then drop any database connections they inherited. the
+# templates are compiled and the asset bundles built before the fork, and
+# everything loaded so far is moved out of the garbage collector's reach
+# (gc.freeze) so collections in the workers do not touch, and un-share,
+# the pages they inherited.
+
+
+def production_app():
+    # the configured app, refusing to start without a shared secret or
+    # with debug mode on
+    if not os.getenv('SECRET_KEY'):
+        raise RuntimeError('set SECRET_KEY in the environment')
+
+    app = create_app()
+    if app.debug:
+        raise RuntimeError('DEBUG must be off in production')
+
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+    assets.load()
+    return app
+
+
+app = production_app()
+gc.freeze()